@@ -2,13 +2,133 @@ from typing import List, Tuple, Optional
 from dataclasses import dataclass
 import numpy as np
 
+# Shared PCG64 generator: one batched draw per tick replaces thousands of
+# scalar np.random calls, each of which pays Python/C dispatch overhead
+_rng = np.random.default_rng()
+
+# Integer codes for schedule entry location types
+LOC_HOME = 0
+LOC_WORK = 1
+LOC_HOME_STATION = 2
+LOC_WORK_STATION = 3
+LOC_TRANSFER = 4
+LOC_IZAKAYA = 5
+
+# One schedule entry: location-type code, start hour, duration in hours.
+# A structured array keeps each agent's schedule in ~9 bytes per entry
+# instead of a Python object per entry
+SCHEDULE_DTYPE = np.dtype([
+    ('loc_type', 'i1'),
+    ('start', 'f4'),
+    ('duration', 'f4'),
+    ('transfer_idx', 'i1'),  # position in transfer_stations, -1 if not a transfer
+])
+
+# Transmission-rate multiplier indexed by location-type code
+LOCATION_RATE_MODIFIERS = np.array([
+    0.1,  # home: very low transmission
+    0.2,  # work: significantly reduced transmission
+    2.0,  # home_station: crowded transit
+    2.0,  # work_station: crowded transit
+    2.0,  # transfer: crowded transit
+    5.0,  # izakaya: significantly increased transmission
+], dtype=np.float32)
+
+# Schedule-row skeletons keyed by agent archetype. The loc_type /
+# transfer_idx structure repeats across agents; only the time fields are
+# re-rolled per agent, so generation clones a cached array and fills times
+_schedule_templates = {}
+
+def _schedule_template(uses_train: bool, num_transfers: int, variant: str) -> np.ndarray:
+    key = (uses_train, num_transfers, variant)
+    template = _schedule_templates.get(key)
+    if template is None:
+        rows = [(LOC_HOME, 0.0, 0.0, -1)]
+
+        if uses_train:
+            rows.append((LOC_HOME_STATION, 0.0, 0.0, -1))
+            for k in range(num_transfers):
+                rows.append((LOC_TRANSFER, 0.0, 0.0, k))
+            rows.append((LOC_WORK_STATION, 0.0, 0.0, -1))
+
+        rows.append((LOC_WORK, 0.0, 0.0, -1))
+
+        if variant != "none":
+            rows.append((LOC_IZAKAYA, 0.0, 0.0, -1))
+
+        if variant == "stay_out":
+            # Misses the last train: a second izakaya stretch until morning
+            rows.append((LOC_IZAKAYA, 0.0, 0.0, -1))
+        else:
+            if uses_train:
+                rows.append((LOC_WORK_STATION, 0.0, 0.0, -1))
+                for k in range(num_transfers - 1, -1, -1):
+                    rows.append((LOC_TRANSFER, 0.0, 0.0, k))
+                rows.append((LOC_HOME_STATION, 0.0, 0.0, -1))
+            rows.append((LOC_HOME, 0.0, 0.0, -1))
+
+        template = np.array(rows, dtype=SCHEDULE_DTYPE)
+        _schedule_templates[key] = template
+    return template
+
 @dataclass
-class Schedule:
-    location_type: str  # 'home', 'work', 'home_station', 'work_station', 'transfer', 'izakaya'
-    duration: float    # in hours
-    start_time: float  # 24-hour format
+class AgentArrays:
+    """
+    Struct-of-Arrays storage for the hot per-agent state.
+
+    Keeping locations and idea flags in contiguous NumPy arrays lets the
+    interaction step run as a handful of vectorized passes over the whole
+    population instead of a Python loop over agent objects.
+    """
+    locations_xy: np.ndarray  # (N, 2) float32, current agent coordinates
+    has_idea: np.ndarray      # (N,) bool
+    ids: np.ndarray           # (N,) int32
+    hourly_locations: np.ndarray = None  # (N, 24, 2) float32, per-hour coords
+    hourly_rate_mult: np.ndarray = None  # (N, 24) float32, per-hour rate modifier
+    hourly_loc_ids: np.ndarray = None    # (N, 24) int32, per-hour location IDs
+    current_loc_ids: np.ndarray = None   # (N,) int32, location ID this tick
+    num_locations: int = 0               # number of distinct location IDs
+
+    @classmethod
+    def allocate(cls, num_agents: int) -> 'AgentArrays':
+        arrays = cls(
+            locations_xy=np.zeros((num_agents, 2), dtype=np.float32),
+            has_idea=np.zeros(num_agents, dtype=np.bool_),
+            ids=np.arange(num_agents, dtype=np.int32)
+        )
+        # Scratch buffers reused every tick to avoid reallocating a fresh
+        # boolean/random array per interact() call
+        arrays._eq_scratch = np.empty((num_agents, 2), dtype=np.bool_)
+        arrays._rand_buf = np.empty(num_agents, dtype=np.float64)
+        return arrays
+
+    def pack_idea_flags(self) -> np.ndarray:
+        """
+        Snapshot has_idea as a packed bitmap, 8 agents per byte.
+
+        The kernels keep working on the byte-per-agent bool array (packed
+        words would force serializing atomic updates under prange); the
+        bitmap form is for storing per-tick snapshots at 1/8 the memory.
+        """
+        return np.packbits(self.has_idea)
+
+    def unpack_idea_flags(self, packed: np.ndarray) -> np.ndarray:
+        """Expand a pack_idea_flags() bitmap back to a bool array"""
+        return np.unpackbits(packed, count=len(self.has_idea)).astype(np.bool_)
 
 class TokyoResident:
+    # Fixed attribute layout: no per-instance __dict__, which saves a few
+    # hundred bytes per agent and speeds up attribute access at ABM scale.
+    # current_location and has_idea are properties, so only their backing
+    # fields are listed here
+    __slots__ = (
+        'id', 'home_location', 'work_location', 'home_station',
+        'work_station', 'transfer_stations', 'izakaya_location',
+        'uses_train', 'goes_to_izakaya', 'arrays', 'idx',
+        '_current_location', '_has_idea', 'schedule', 'current_time',
+        'hourly_location', 'hourly_rate_modifier', '_loc_table',
+    )
+
     def __init__(
         self,
         id: int,
@@ -31,144 +151,242 @@ class TokyoResident:
         self.izakaya_location = izakaya_location
         self.uses_train = uses_train
         self.goes_to_izakaya = goes_to_izakaya
-        self.current_location = home_location
-        self.has_idea = has_idea
-        self.schedule: List[Schedule] = []
+        self.arrays: Optional[AgentArrays] = None
+        self.idx: Optional[int] = None
+        self._current_location = home_location
+        self._has_idea = has_idea
+        self.schedule = np.empty(0, dtype=SCHEDULE_DTYPE)
         self.current_time = 0
+        # Hour -> coordinates lookup, rebuilt whenever the schedule changes.
+        # Defaults to staying home so move() is safe before any schedule exists
+        self.hourly_location = np.tile(
+            np.asarray(home_location, dtype=np.float32), (24, 1)
+        )
+        self.hourly_rate_modifier = np.ones(24, dtype=np.float32)
+        # Coordinates indexed by location-type code; NaN marks types this
+        # agent cannot occupy. Transfers resolve through transfer_idx
+        loc_table = np.full((len(LOCATION_RATE_MODIFIERS), 2), np.nan,
+                            dtype=np.float32)
+        loc_table[LOC_HOME] = home_location
+        loc_table[LOC_WORK] = work_location
+        if home_station:
+            loc_table[LOC_HOME_STATION] = home_station
+        if work_station:
+            loc_table[LOC_WORK_STATION] = work_station
+        if izakaya_location:
+            loc_table[LOC_IZAKAYA] = izakaya_location
+        self._loc_table = loc_table
 
-    def generate_daily_schedule(self) -> List[Schedule]:
-        """Creates a realistic daily schedule with transfers"""
-        # Randomize work start time (most people start between 8-10)
-        work_start = np.random.normal(9, 0.5)  # Normal distribution centered at 9
-        work_start = max(min(work_start, 10), 8)  # Clamp between 8 and 10
-
-        schedule = []
-        current_time = 0.0
+    def bind_arrays(self, arrays: AgentArrays, idx: int) -> None:
+        """Attach this agent to a row of the population's SoA storage"""
+        self.arrays = arrays
+        self.idx = idx
+        arrays.locations_xy[idx] = self._current_location
+        arrays.has_idea[idx] = self._has_idea
 
-        # Morning at home
-        schedule.append(Schedule("home", work_start, current_time))
-        current_time = work_start
+    @property
+    def current_location(self) -> Tuple[float, float]:
+        if self.arrays is not None:
+            return tuple(self.arrays.locations_xy[self.idx])
+        return self._current_location
 
-        if self.uses_train:
-            # Morning commute with transfers
-            schedule.append(Schedule("home_station", 0.3, current_time))
-            current_time += 0.3
+    @current_location.setter
+    def current_location(self, value: Tuple[float, float]) -> None:
+        if self.arrays is not None:
+            self.arrays.locations_xy[self.idx] = value
+        else:
+            self._current_location = value
 
-            # Add transfer stations to morning commute
-            for transfer_station in self.transfer_stations:
-                schedule.append(Schedule("transfer", 0.2, current_time))
-                current_time += 0.2
+    @property
+    def has_idea(self) -> bool:
+        if self.arrays is not None:
+            return bool(self.arrays.has_idea[self.idx])
+        return self._has_idea
 
-            schedule.append(Schedule("work_station", 0.3, current_time))
-            current_time += 0.3
+    @has_idea.setter
+    def has_idea(self, value: bool) -> None:
+        if self.arrays is not None:
+            self.arrays.has_idea[self.idx] = value
         else:
-            # Direct commute without train
-            current_time += 0.5  # Simple commute time
+            self._has_idea = value
+
+    def generate_daily_schedule(self, rng: np.random.Generator = None) -> np.ndarray:
+        """Creates a realistic daily schedule with transfers"""
+        if rng is None:
+            rng = _rng
+        # Randomize work start time (most people start between 8-10)
+        work_start = rng.normal(9, 0.5)  # Normal distribution centered at 9
+        work_start = max(min(work_start, 10), 8)  # Clamp between 8 and 10
 
-        # Work day
-        work_duration = np.random.normal(8, 0.5)  # Normal distribution around 8 hours
+        # Work day length
+        work_duration = rng.normal(8, 0.5)  # Normal distribution around 8 hours
         work_duration = max(min(work_duration, 9), 7)  # Clamp between 7-9 hours
-        schedule.append(Schedule("work", work_duration, current_time))
-        current_time += work_duration
 
-        # Evening activities
+        # Evening plans decide which schedule shape applies
+        izakaya_duration = 0.0
+        variant = "none"
         if self.goes_to_izakaya and self.izakaya_location:
-            # Randomly decide between early night and late night
-            late_night = np.random.random() < 0.2  # 20% chance of staying out late
-
+            late_night = rng.random() < 0.2  # 20% chance of staying out late
             if late_night:
-                # Stay until last train or even later
-                izakaya_duration = np.random.uniform(4, 6)
-                schedule.append(Schedule("izakaya", izakaya_duration, current_time))
-                current_time += izakaya_duration
-
-                if np.random.random() < 0.3:  # 30% chance of missing last train
-                    # Stay until first train (around 5 AM)
-                    schedule.append(Schedule("izakaya", 24 - current_time, current_time))
-                    return schedule
+                izakaya_duration = rng.uniform(4, 6)
+                if rng.random() < 0.3:  # 30% chance of missing last train
+                    variant = "stay_out"  # at the izakaya until first train
+                else:
+                    variant = "izakaya"
             else:
                 # Regular izakaya visit
-                izakaya_duration = np.random.uniform(1.5, 3)
-                schedule.append(Schedule("izakaya", izakaya_duration, current_time))
-                current_time += izakaya_duration
-
-        # Evening commute
-        if self.uses_train:
-            schedule.append(Schedule("work_station", 0.3, current_time))
-            current_time += 0.3
-
-            # Return journey transfers
-            for transfer_station in reversed(self.transfer_stations):
-                schedule.append(Schedule("transfer", 0.2, current_time))
-                current_time += 0.2
-
-            schedule.append(Schedule("home_station", 0.3, current_time))
-            current_time += 0.3
-        else:
-            # Direct commute home
-            current_time += 0.5
+                izakaya_duration = rng.uniform(1.5, 3)
+                variant = "izakaya"
 
-        # Rest of the day at home
-        schedule.append(Schedule("home", 24 - current_time, current_time))
+        return self._fill_schedule(work_start, work_duration,
+                                   izakaya_duration, variant)
+
+    def _fill_schedule(self, work_start: float, work_duration: float,
+                       izakaya_duration: float, variant: str) -> np.ndarray:
+        """Clone the archetype skeleton and fill in this agent's times"""
+        schedule = _schedule_template(
+            self.uses_train, len(self.transfer_stations), variant).copy()
+
+        current_time = 0.0
+        last_row = len(schedule) - 1
+        for i in range(len(schedule)):
+            loc_type = schedule['loc_type'][i]
+            if loc_type == LOC_HOME:
+                if i == 0:
+                    duration = work_start
+                else:
+                    if not self.uses_train:
+                        current_time += 0.5  # Direct commute home
+                    duration = 24 - current_time
+            elif loc_type == LOC_WORK:
+                if not self.uses_train:
+                    current_time += 0.5  # Simple commute time
+                duration = work_duration
+            elif loc_type == LOC_IZAKAYA:
+                if variant == "stay_out" and i == last_row:
+                    # Stay until first train (around 5 AM)
+                    duration = 24 - current_time
+                else:
+                    duration = izakaya_duration
+            elif loc_type == LOC_TRANSFER:
+                duration = 0.2
+            else:  # home/work station
+                duration = 0.3
+
+            schedule['start'][i] = current_time
+            schedule['duration'][i] = duration
+            current_time += duration
 
         self.schedule = schedule
-        return schedule
+        self._materialize_hourly_table()
+        return self.schedule
 
-    def move(self, time: int) -> Tuple[float, float]:
-        """Updates location based on schedule and time"""
-        time_float = float(time)
-
-        for schedule in self.schedule:
-            if schedule.start_time <= time_float < (schedule.start_time + schedule.duration):
-                if schedule.location_type == "home":
-                    self.current_location = self.home_location
-                elif schedule.location_type == "work":
-                    self.current_location = self.work_location
-                elif schedule.location_type == "home_station" and self.home_station:
-                    self.current_location = self.home_station
-                elif schedule.location_type == "work_station" and self.work_station:
-                    self.current_location = self.work_station
-                elif schedule.location_type == "transfer":
-                    idx = sum(1 for s in self.schedule[:self.schedule.index(schedule)]
-                            if s.location_type == "transfer")
-                    if 0 <= idx < len(self.transfer_stations):
-                        self.current_location = self.transfer_stations[idx]
-                    else:
-                        # Fallback to work station if index is out of range
-                        self.current_location = self.work_station if self.work_station else self.work_location
-                elif schedule.location_type == "izakaya" and self.izakaya_location:
-                    self.current_location = self.izakaya_location
-                break
+    def _resolve_entry_coords(self, loc_type: int, transfer_idx: int) -> Optional[Tuple[float, float]]:
+        """Map a schedule entry's location-type code to coordinates"""
+        if loc_type == LOC_TRANSFER:
+            if 0 <= transfer_idx < len(self.transfer_stations):
+                return self.transfer_stations[transfer_idx]
+            # Fallback to work station if index is out of range
+            return self.work_station if self.work_station else self.work_location
+
+        coords = self._loc_table[loc_type]
+        if np.isnan(coords[0]):
+            return None
+        return coords
 
+    def _materialize_hourly_table(self) -> None:
+        """
+        Precompute the agent's coordinates for each hour of the day.
+
+        Schedules are fixed once generated and the simulation ticks on whole
+        hours, so this turns move() into a single array lookup instead of a
+        linear scan over schedule entries with string dispatch.
+        """
+        table = np.empty((24, 2), dtype=np.float32)
+        rate_table = np.empty(24, dtype=np.float32)
+        prev = self.home_location
+        prev_modifier = 1.0
+
+        for hour in range(24):
+            coords = None
+            for entry in self.schedule:
+                if entry['start'] <= hour < entry['start'] + entry['duration']:
+                    coords = self._resolve_entry_coords(
+                        int(entry['loc_type']), int(entry['transfer_idx']))
+                    prev_modifier = LOCATION_RATE_MODIFIERS[entry['loc_type']]
+                    break
+
+            if coords is not None:
+                prev = coords
+            table[hour] = prev
+            rate_table[hour] = prev_modifier
+
+        self.hourly_location = table
+        self.hourly_rate_modifier = rate_table
+
+    def move(self, time: int) -> Tuple[float, float]:
+        """Updates location based on the precomputed hourly table"""
+        self.current_location = tuple(self.hourly_location[time % 24])
         return self.current_location
 
-    def interact(self, other_agents: List['TokyoResident'], base_transmission_rate: float):
-        """Attempt to spread idea to other agents at same location"""
+    def transmission_modifier(self) -> float:
+        """Location-type multiplier applied to the base transmission rate"""
+        hour = self.current_time % 24
+        for entry in self.schedule:
+            if entry['start'] <= hour < entry['start'] + entry['duration']:
+                return float(LOCATION_RATE_MODIFIERS[entry['loc_type']])
+        return 1.0
+
+    def interact(self, arrays: AgentArrays, base_transmission_rate: float):
+        """Attempt to spread idea to all co-located agents in one vectorized pass"""
         if not self.has_idea:
             return
 
-        # Get current schedule entry to determine location type
-        current_schedule = next(
-            (s for s in self.schedule
-             if s.start_time <= (self.current_time % 24) < s.start_time + s.duration),
-            None
-        )
+        modified_rate = base_transmission_rate * self.transmission_modifier()
+
+        # Apply transmission to every co-located susceptible agent at once,
+        # drawing all randoms for the tick in a single batched call
+        np.equal(arrays.locations_xy, arrays.locations_xy[self.idx],
+                 out=arrays._eq_scratch)
+        colocated = arrays._eq_scratch.all(axis=1)
+        _rng.random(out=arrays._rand_buf)
+        hits = (colocated &
+                ~arrays.has_idea &
+                (arrays._rand_buf < modified_rate))
+        arrays.has_idea |= hits
+
+def build_population_schedules(
+    agents: List['TokyoResident'],
+    rng: np.random.Generator = None
+) -> None:
+    """
+    Generate daily schedules for an entire population at once.
+
+    All random values are drawn as batched array calls up front, so the
+    per-agent work reduces to cloning the cached archetype skeleton and
+    filling in its time fields. Pass the simulation's generator as rng
+    for reproducible schedules; the module-level one is the default.
+    """
+    if rng is None:
+        rng = _rng
+    num_agents = len(agents)
+    work_starts = np.clip(rng.normal(9, 0.5, num_agents), 8, 10)
+    work_durations = np.clip(rng.normal(8, 0.5, num_agents), 7, 9)
+    late_night = rng.random(num_agents) < 0.2
+    miss_train = rng.random(num_agents) < 0.3
+    late_durations = rng.uniform(4, 6, num_agents)
+    early_durations = rng.uniform(1.5, 3, num_agents)
+
+    for i, agent in enumerate(agents):
+        izakaya_duration = 0.0
+        variant = "none"
+        if agent.goes_to_izakaya and agent.izakaya_location:
+            if late_night[i]:
+                izakaya_duration = late_durations[i]
+                variant = "stay_out" if miss_train[i] else "izakaya"
+            else:
+                izakaya_duration = early_durations[i]
+                variant = "izakaya"
 
-        if current_schedule:
-            # Modify transmission rate based on location type
-            modified_rate = base_transmission_rate
-            if current_schedule.location_type == "work":
-                modified_rate *= 0.2  # Significantly reduce transmission at work
-            elif current_schedule.location_type == "izakaya":
-                modified_rate *= 5.0  # Significantly increase transmission at izakaya
-            elif current_schedule.location_type in ["transfer", "work_station", "home_station"]:
-                modified_rate *= 2.0  # Moderate increase in crowded transit areas
-            elif current_schedule.location_type == "home":
-                modified_rate *= 0.1  # Very low transmission at home
-
-            # Apply transmission to other agents
-            for agent in other_agents:
-                if (agent.current_location == self.current_location and
-                    not agent.has_idea and
-                    np.random.random() < modified_rate):
-                    agent.has_idea = True
+        agent._fill_schedule(work_starts[i], work_durations[i],
+                             izakaya_duration, variant)
@@ -0,0 +1,154 @@
+import math
+
+from numba import njit, prange
+import numpy as np
+
+@njit(cache=True, fastmath=True)
+def point_distance(a_lat, a_lon, b_lat, b_lon):
+    """Distance between two coordinate pairs (unpacked scalars)"""
+    return math.sqrt((a_lat - b_lat) ** 2 + (a_lon - b_lon) ** 2)
+
+@njit(cache=True, fastmath=True)
+def point_is_between(p_lat, p_lon, s_lat, s_lon, e_lat, e_lon, tolerance):
+    """
+    Is point roughly between start and end? Projection test on squared
+    quantities: project the point onto the start->end segment and require
+    the projection to fall inside the segment with a perpendicular
+    offset below tolerance * segment length. No square roots needed.
+    """
+    v_lat = e_lat - s_lat
+    v_lon = e_lon - s_lon
+    w_lat = p_lat - s_lat
+    w_lon = p_lon - s_lon
+
+    vv = v_lat * v_lat + v_lon * v_lon
+    if vv == 0.0:
+        return False
+    vw = v_lat * w_lat + v_lon * w_lon
+
+    # Projection parameter t = (v . w) / (v . v) must lie in [0, 1]
+    if vw < 0.0 or vw > vv:
+        return False
+
+    # Perpendicular distance^2 = |w|^2 - t * (v . w), compared against
+    # (tolerance * |v|)^2 = tolerance^2 * (v . v)
+    ww = w_lat * w_lat + w_lon * w_lon
+    perp_sq = ww - (vw * vw) / vv
+    return perp_sq < tolerance * tolerance * vv
+
+@njit(parallel=True, nogil=True, fastmath=True, cache=True)
+def step_agents(hourly_locations, hourly_loc_ids, hourly_rate_mult,
+                locations_xy, current_loc_ids, has_idea, hour, base_rate,
+                rand):
+    """
+    Fused move + interact pass for one simulation tick.
+
+    Gathers every agent's coordinates and integer location ID for the
+    current hour, sorts the IDs once to group co-located agents, and runs
+    transmission within each group. The gather and the per-group
+    transmission both run under prange: groups partition the population,
+    so no two threads ever touch the same agent's flags.
+
+    rand holds one pre-drawn uniform per agent for this tick's Bernoulli
+    draws. Drawing from the caller's seeded generator instead of Numba's
+    per-thread RNG keeps seeded runs reproducible regardless of thread
+    scheduling.
+    """
+    num_agents = hourly_locations.shape[0]
+    keys = np.empty(num_agents, dtype=np.int32)
+
+    for i in prange(num_agents):
+        locations_xy[i, 0] = hourly_locations[i, hour, 0]
+        locations_xy[i, 1] = hourly_locations[i, hour, 1]
+        keys[i] = hourly_loc_ids[i, hour]
+        current_loc_ids[i] = keys[i]
+
+    order = np.argsort(keys)
+
+    # Serial pass to find group boundaries in the sorted key order
+    group_starts = np.empty(num_agents + 1, dtype=np.int64)
+    num_groups = 0
+    for k in range(num_agents):
+        if k == 0 or keys[order[k]] != keys[order[k - 1]]:
+            group_starts[num_groups] = k
+            num_groups += 1
+    group_starts[num_groups] = num_agents
+
+    for g in prange(num_groups):
+        start = group_starts[g]
+        end = group_starts[g + 1]
+
+        group_size = end - start
+        if group_size > 1:
+            # Histogram pass: skip groups with no infectious member (the
+            # common case early in a run) or no susceptible member
+            num_infectious = 0
+            for k in range(start, end):
+                if has_idea[order[k]]:
+                    num_infectious += 1
+
+            if 0 < num_infectious < group_size:
+                density_multiplier = min(group_size / 10.0, 2.0)  # Cap at 2x
+
+                # Aggregate the group's spreaders into one effective
+                # probability: p_eff = 1 - prod_j(1 - rate_j), accumulated
+                # in log space for numerical stability at small rates
+                log_miss = 0.0
+                for m in range(start, end):
+                    j = order[m]
+                    if has_idea[j]:
+                        rate = min(base_rate * density_multiplier *
+                                   hourly_rate_mult[j, hour], 1.0)
+                        log_miss += np.log1p(-rate)
+                p_eff = -np.expm1(log_miss)
+
+                # One Bernoulli draw per susceptible instead of one per
+                # susceptible-spreader pair
+                for k in range(start, end):
+                    i = order[k]
+                    if not has_idea[i] and rand[i] < p_eff:
+                        has_idea[i] = True
+
+@njit(parallel=True, fastmath=True, cache=True)
+def spread_ideas(locations_xy, has_idea, rates):
+    """
+    All-pairs idea transmission between co-located agents.
+
+    Each susceptible agent scans for infectious agents at its exact
+    coordinates and flips on the first successful transmission draw.
+    `rates` holds the per-agent transmission rate of each potential
+    spreader (base rate with location and density modifiers applied).
+    """
+    num_agents = locations_xy.shape[0]
+    for i in prange(num_agents):
+        if has_idea[i]:
+            continue
+        for j in range(num_agents):
+            if (has_idea[j] and
+                    locations_xy[i, 0] == locations_xy[j, 0] and
+                    locations_xy[i, 1] == locations_xy[j, 1] and
+                    np.random.random() < rates[j]):
+                has_idea[i] = True
+                break
+
+def warm_kernels():
+    """
+    Trigger compilation (or cache load) of every kernel on dummy inputs.
+
+    Call at process startup so the one-time JIT cost is paid before the
+    first real simulation request instead of during it. With cache=True
+    on the kernels this is usually just a fast cache load.
+    """
+    hourly_locations = np.zeros((2, 24, 2), dtype=np.float32)
+    hourly_loc_ids = np.zeros((2, 24), dtype=np.int32)
+    hourly_rate_mult = np.ones((2, 24), dtype=np.float32)
+    locations_xy = np.zeros((2, 2), dtype=np.float32)
+    current_loc_ids = np.zeros(2, dtype=np.int32)
+    has_idea = np.zeros(2, dtype=np.bool_)
+
+    step_agents(hourly_locations, hourly_loc_ids, hourly_rate_mult,
+                locations_xy, current_loc_ids, has_idea, 0, 0.0,
+                np.ones(2, dtype=np.float64))
+    spread_ideas(locations_xy, has_idea, np.zeros(2, dtype=np.float64))
+    point_distance(0.0, 0.0, 1.0, 1.0)
+    point_is_between(0.5, 0.5, 0.0, 0.0, 1.0, 1.0, 0.1)
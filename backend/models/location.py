@@ -1,5 +1,7 @@
 from typing import Dict, List, Tuple
 from dataclasses import dataclass
+import numpy as np
+from scipy.spatial import cKDTree
 
 @dataclass
 class LocationParams:
@@ -17,26 +19,39 @@ class Location:
         self.type = location_type
         self.coordinates = coordinates
         self.params = params
-        self.current_occupants: List[int] = []  # List of agent IDs
+        self.id: int = -1  # Assigned by LocationManager.add_location
+        # Occupant agent IDs in a preallocated int32 array; _occupant_count
+        # tracks the live prefix. 4 bytes per occupant instead of a boxed
+        # Python int, and contents can feed vectorized stats directly
+        self.current_occupants = np.empty(params.capacity, dtype=np.int32)
+        self._occupant_count = 0
 
     def add_occupant(self, agent_id: int) -> bool:
         """
         Add an agent to this location if capacity allows
         Returns True if successful, False if at capacity
         """
-        if len(self.current_occupants) < self.params.capacity:
-            self.current_occupants.append(agent_id)
+        if self._occupant_count < self.params.capacity:
+            self.current_occupants[self._occupant_count] = agent_id
+            self._occupant_count += 1
             return True
         return False
 
     def remove_occupant(self, agent_id: int) -> None:
-        """Remove an agent from this location"""
-        if agent_id in self.current_occupants:
-            self.current_occupants.remove(agent_id)
+        """Remove an agent from this location (swap-with-last, O(1))"""
+        live = self.current_occupants[:self._occupant_count]
+        matches = np.flatnonzero(live == agent_id)
+        if len(matches):
+            self._occupant_count -= 1
+            live[matches[0]] = live[self._occupant_count]
+
+    def occupant_count(self) -> int:
+        """Number of agents currently at this location"""
+        return self._occupant_count
 
     def get_occupancy_ratio(self) -> float:
         """Return current occupancy ratio (0.0 to 1.0)"""
-        return len(self.current_occupants) / self.params.capacity
+        return self._occupant_count / self.params.capacity
 
     def get_transmission_factor(self) -> float:
         """
@@ -54,10 +69,39 @@ class Location:
 class LocationManager:
     def __init__(self):
         self.locations: Dict[str, Location] = {}
+        self.by_type: Dict[str, List[Tuple[str, Location]]] = {}
+        # Spatial index over location coordinates, built lazily and
+        # invalidated whenever a location is added
+        self._tree: cKDTree = None
+        self._tree_entries: List[Tuple[str, Location]] = []
+        self._coords: np.ndarray = None
+        self._index_dirty = True
 
     def add_location(self, location_id: str, location: Location) -> None:
-        """Add a location to the manager"""
+        """Add a location to the manager, assigning it an integer ID"""
+        location.id = len(self.locations)
         self.locations[location_id] = location
+        self.by_type.setdefault(location.type, []).append((location_id, location))
+        self._index_dirty = True
+
+    # Below this many locations, a brute-force vectorized scan beats
+    # KD-tree construction + traversal overhead
+    _TREE_THRESHOLD = 50
+
+    def _build_spatial_index(self) -> None:
+        """(Re)build the coordinate table and KD-tree over all locations"""
+        self._tree_entries = list(self.locations.items())
+        # reshape keeps the table (0, 2) when there are no locations;
+        # np.array alone would collapse it to shape (0,)
+        self._coords = np.array(
+            [loc.coordinates for _, loc in self._tree_entries],
+            dtype=np.float32
+        ).reshape(-1, 2)
+        if len(self._tree_entries) > self._TREE_THRESHOLD:
+            self._tree = cKDTree(self._coords)
+        else:
+            self._tree = None
+        self._index_dirty = False
 
     def get_location(self, location_id: str) -> Location:
         """Get a location by ID"""
@@ -65,8 +109,7 @@ class LocationManager:
 
     def get_locations_by_type(self, location_type: str) -> List[Tuple[str, Location]]:
         """Get all locations of a specific type"""
-        return [(loc_id, loc) for loc_id, loc in self.locations.items()
-                if loc.type == location_type]
+        return self.by_type.get(location_type, [])
 
     def get_nearby_locations(
         self,
@@ -75,37 +118,50 @@ class LocationManager:
         location_type: str = None
     ) -> List[Tuple[str, Location]]:
         """Find locations within radius of coordinates"""
+        if self._index_dirty:
+            self._build_spatial_index()
+
+        if self._tree is not None:
+            indices = self._tree.query_ball_point(coordinates, radius)
+        else:
+            # Small location sets: one vectorized squared-distance pass,
+            # no sqrt and no tree overhead
+            diff = self._coords - np.asarray(coordinates, dtype=np.float32)
+            d2 = np.einsum('ij,ij->i', diff, diff)
+            indices = np.flatnonzero(d2 <= radius * radius)
+
         nearby = []
-        for loc_id, loc in self.locations.items():
+        for idx in indices:
+            loc_id, loc = self._tree_entries[idx]
             if location_type and loc.type != location_type:
                 continue
-
-            dist = ((coordinates[0] - loc.coordinates[0])**2 +
-                   (coordinates[1] - loc.coordinates[1])**2)**0.5
-
-            if dist <= radius:
-                nearby.append((loc_id, loc))
+            nearby.append((loc_id, loc))
 
         return nearby
 
     def update_capacities(self, location_type: str, new_capacity: int) -> None:
         """Update capacity for all locations of a specific type"""
-        for location in self.locations.values():
-            if location.type == location_type:
-                location.params.capacity = new_capacity
-                # Remove excess occupants if necessary
-                while len(location.current_occupants) > new_capacity:
-                    location.current_occupants.pop()
+        for _, location in self.by_type.get(location_type, []):
+            location.params.capacity = new_capacity
+            # Drop excess occupants if necessary
+            if location._occupant_count > new_capacity:
+                location._occupant_count = new_capacity
+            # Grow the occupant array if the new capacity exceeds its
+            # allocation, or add_occupant would index past the end
+            elif new_capacity > len(location.current_occupants):
+                grown = np.empty(new_capacity, dtype=np.int32)
+                grown[:location._occupant_count] = \
+                    location.current_occupants[:location._occupant_count]
+                location.current_occupants = grown
 
     def get_occupancy_stats(self) -> Dict[str, Dict]:
         """Get occupancy statistics for all location types"""
         stats = {}
-        for location_type in set(loc.type for loc in self.locations.values()):
-            locations_of_type = [loc for loc in self.locations.values()
-                               if loc.type == location_type]
+        for location_type, entries in self.by_type.items():
+            locations_of_type = [loc for _, loc in entries]
 
             total_capacity = sum(loc.params.capacity for loc in locations_of_type)
-            total_occupants = sum(len(loc.current_occupants) for loc in locations_of_type)
+            total_occupants = sum(loc._occupant_count for loc in locations_of_type)
 
             stats[location_type] = {
                 'total_capacity': total_capacity,
@@ -119,4 +175,4 @@ class LocationManager:
     def clear_all_occupants(self) -> None:
         """Clear all occupants from all locations"""
         for location in self.locations.values():
-            location.current_occupants.clear()
+            location._occupant_count = 0
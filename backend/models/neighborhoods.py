@@ -1,5 +1,7 @@
 from typing import Tuple, List, Dict
 
+import numpy as np
+
 # Major residential neighborhoods in Tokyo with approximate coordinates
 TOKYO_NEIGHBORHOODS = {
     "Setagaya": {
@@ -39,10 +41,22 @@ TOKYO_NEIGHBORHOODS = {
     }
 }
 
+# Sampling tables built once at import: neighborhoods in a fixed order
+# and the normalized cumulative population weights for inverse-CDF draws
+_NEIGHBORHOOD_LIST = list(TOKYO_NEIGHBORHOODS.values())
+_NEIGHBORHOOD_CDF = np.cumsum(
+    [n["population_weight"] for n in _NEIGHBORHOOD_LIST])
+_NEIGHBORHOOD_CDF /= _NEIGHBORHOOD_CDF[-1]
+
+def sample_neighborhoods(n: int, rng: np.random.Generator = None) -> List[Dict]:
+    """Sample n neighborhoods by population weight in one batched draw"""
+    if rng is None:
+        rng = np.random.default_rng()
+    idxs = np.searchsorted(_NEIGHBORHOOD_CDF, rng.random(n))
+    return [_NEIGHBORHOOD_LIST[i] for i in idxs]
+
 def generate_home_location(neighborhood: Dict) -> Tuple[float, float]:
     """Generate a random location within a neighborhood's radius"""
-    import numpy as np
-
     center = neighborhood["center"]
     radius = neighborhood["radius"]
 
@@ -59,11 +73,29 @@ def generate_home_location(neighborhood: Dict) -> Tuple[float, float]:
         center[1] + lon_offset
     )
 
-def select_random_neighborhood() -> Dict:
-    """Select a random neighborhood based on population weights"""
-    import numpy as np
+def generate_home_locations_batch(
+    neighborhoods: List[Dict],
+    rng: np.random.Generator = None
+) -> np.ndarray:
+    """
+    Generate one home location per neighborhood entry as an (N, 2) array.
 
-    neighborhoods = list(TOKYO_NEIGHBORHOODS.values())
-    weights = [n["population_weight"] for n in neighborhoods]
+    Same disc sampling as generate_home_location, but with the angle and
+    radius draws and the cos/sin math done as single vectorized calls for
+    the whole population.
+    """
+    if rng is None:
+        rng = np.random.default_rng()
 
-    return np.random.choice(neighborhoods, p=weights)
+    centers = np.array([n["center"] for n in neighborhoods])
+    radii = np.array([n["radius"] for n in neighborhoods])
+
+    n = len(neighborhoods)
+    angles = rng.uniform(0, 2 * np.pi, n)
+    r = radii * np.sqrt(rng.uniform(0, 1, n))
+
+    return centers + np.column_stack((r * np.cos(angles), r * np.sin(angles)))
+
+def select_random_neighborhood() -> Dict:
+    """Select a random neighborhood based on population weights"""
+    return sample_neighborhoods(1)[0]
@@ -0,0 +1,48 @@
+from typing import Dict, List, Optional, Sequence, Tuple
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from .simulation import TokyoSimulation
+
+def _run_one(args: Tuple) -> Dict:
+    """Run a single seeded replicate and return its final state"""
+    seed, num_agents, city_bounds, simulation_params, num_steps = args
+    # The simulation draws from its own Generator, not numpy's legacy
+    # global state, so the seed has to travel through simulation_params
+    sim = TokyoSimulation(
+        num_agents=num_agents,
+        city_bounds=city_bounds,
+        simulation_params={**simulation_params, 'seed': seed}
+    )
+    for _ in range(num_steps):
+        sim.step()
+    return sim.get_state()
+
+def run_many(
+    n_reps: int,
+    num_agents: int,
+    city_bounds: Tuple[Tuple[float, float], Tuple[float, float]],
+    simulation_params: Dict,
+    num_steps: int,
+    seeds: Optional[Sequence[int]] = None,
+    max_workers: int = None
+) -> List[Dict]:
+    """
+    Run independent simulation replicates across processes.
+
+    Replicates share no state, so this scales near-linearly with cores —
+    useful for calibration sweeps and uncertainty estimates over seeds.
+    Kernels are cached (cache=True), so each worker loads the compiled
+    code instead of re-JITting. Returns one get_state() dict per replicate,
+    in seed order.
+    """
+    if seeds is None:
+        seeds = list(range(n_reps))
+    elif len(seeds) != n_reps:
+        raise ValueError(f"Expected {n_reps} seeds, got {len(seeds)}")
+
+    jobs = [(seed, num_agents, city_bounds, simulation_params, num_steps)
+            for seed in seeds]
+
+    with ProcessPoolExecutor(max_workers=max_workers or os.cpu_count()) as executor:
+        return list(executor.map(_run_one, jobs))
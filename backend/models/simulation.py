@@ -1,8 +1,11 @@
 from typing import List, Dict, Tuple
 import numpy as np
-from .agent import TokyoResident
+from .agent import TokyoResident, AgentArrays, build_population_schedules
+from .kernels import step_agents, spread_ideas, point_distance, point_is_between
 from .location import Location, LocationManager, LocationParams
-from .neighborhoods import TOKYO_NEIGHBORHOODS, generate_home_location, select_random_neighborhood
+from scipy.spatial import cKDTree
+from .neighborhoods import TOKYO_NEIGHBORHOODS, generate_home_locations_batch, sample_neighborhoods
+from .simulation_constants import MAJOR_STATIONS, STATION_COORDS, IZAKAYAS_PER_STATION
 
 class TokyoSimulation:
     def __init__(
@@ -15,9 +18,16 @@ class TokyoSimulation:
         self.city_bounds = city_bounds  # ((min_lat, min_lon), (max_lat, max_lon))
         self.params = simulation_params
         self.current_time = 0
+        # Agents within the same interaction-radius-sized grid cell are
+        # considered co-located for transmission
+        self._cell_size = self.params.get('interaction_radius', 0.001)
+        # One PCG64 generator for every batched draw during setup; pass
+        # 'seed' in simulation_params for reproducible populations
+        self.rng = np.random.default_rng(self.params.get('seed'))
 
         self.location_manager = LocationManager()
         self.agents: List[TokyoResident] = []
+        self.arrays: AgentArrays = None
 
         self.initialize_simulation()
 
@@ -25,8 +35,35 @@ class TokyoSimulation:
         """Set up initial simulation state"""
         self._create_locations()
         self._create_agents()
+        self._bind_agent_arrays()
         self._initialize_idea_spread()
 
+    def _bind_agent_arrays(self):
+        """Move hot agent state into Struct-of-Arrays storage"""
+        self.arrays = AgentArrays.allocate(self.num_agents)
+        for idx, agent in enumerate(self.agents):
+            agent.bind_arrays(self.arrays, idx)
+
+        # Stack the per-agent hourly tables so the fused step kernel can
+        # gather the whole population's movement in one pass
+        self.arrays.hourly_locations = np.stack(
+            [agent.hourly_location for agent in self.agents])
+        self.arrays.hourly_rate_mult = np.stack(
+            [agent.hourly_rate_modifier for agent in self.agents])
+
+        # Assign a compact integer ID to every spatial-hash cell agents
+        # can occupy (homes and workplaces included). Keying on grid cells
+        # of interaction-radius size instead of exact float coordinates
+        # makes co-location a semantic radius test, not float equality
+        flat_cells = np.floor(
+            self.arrays.hourly_locations.reshape(-1, 2) / self._cell_size
+        ).astype(np.int64)
+        unique_coords, inverse = np.unique(flat_cells, axis=0, return_inverse=True)
+        self.arrays.hourly_loc_ids = inverse.reshape(
+            self.num_agents, 24).astype(np.int32)
+        self.arrays.current_loc_ids = self.arrays.hourly_loc_ids[:, 0].copy()
+        self.arrays.num_locations = len(unique_coords)
+
     def _create_locations(self):
         """Initialize locations across Tokyo"""
         station_params = LocationParams(
@@ -35,32 +72,7 @@ class TokyoSimulation:
             capacity=1000
         )
 
-        # Major stations with accurate coordinates
-        major_stations = [
-            ("Tokyo", (35.6812, 139.7671)),
-            ("Shinjuku", (35.6896, 139.7006)),
-            ("Shibuya", (35.6580, 139.7016)),
-            ("Ikebukuro", (35.7295, 139.7109)),
-            ("Shinagawa", (35.6284, 139.7387)),
-            ("Ueno", (35.7141, 139.7774)),
-            ("Akihabara", (35.6982, 139.7731)),
-
-            # Additional stations for transfers
-            ("Harajuku", (35.6702, 139.7027)),
-            ("Ebisu", (35.6462, 139.7103)),
-            ("Meguro", (35.6340, 139.7157)),
-            ("Gotanda", (35.6262, 139.7233)),
-            ("Osaki", (35.6197, 139.7286)),
-            ("Tamachi", (35.6457, 139.7475)),
-            ("Hamamatsucho", (35.6553, 139.7571)),
-            ("Yurakucho", (35.6749, 139.7628)),
-            ("Kanda", (35.6918, 139.7712)),
-            ("Nippori", (35.7281, 139.7707)),
-            ("Komagome", (35.7373, 139.7468)),
-            ("Tabata", (35.7381, 139.7608)),
-        ]
-
-        for name, coords in major_stations:
+        for name, coords in MAJOR_STATIONS:
             station = Location('station', coords, station_params)
             self.location_manager.add_location(f'station_{name}', station)
 
@@ -71,66 +83,106 @@ class TokyoSimulation:
             capacity=self.params.get('izakaya_capacity', 50)
         )
 
-        # Create clusters of izakayas near each station
-        for station_name, station_coords in major_stations:
-            for i in range(3):  # 3 izakayas per station
-                lat_offset = np.random.uniform(-0.005, 0.005)
-                lon_offset = np.random.uniform(-0.005, 0.005)
-                izakaya_coords = (
-                    station_coords[0] + lat_offset,
-                    station_coords[1] + lon_offset
-                )
-                izakaya = Location('izakaya', izakaya_coords, izakaya_params)
+        # Create clusters of izakayas near each station, with all random
+        # offsets drawn in one batched call
+        num_izakayas = len(MAJOR_STATIONS) * IZAKAYAS_PER_STATION
+        izakaya_xy = (np.repeat(STATION_COORDS, IZAKAYAS_PER_STATION, axis=0) +
+                      self.rng.uniform(-0.005, 0.005, size=(num_izakayas, 2)))
+
+        for s, station_name in enumerate(name for name, _ in MAJOR_STATIONS):
+            for i in range(IZAKAYAS_PER_STATION):
+                izakaya = Location(
+                    'izakaya',
+                    tuple(izakaya_xy[s * IZAKAYAS_PER_STATION + i]),
+                    izakaya_params)
                 self.location_manager.add_location(f'izakaya_{station_name}_{i}', izakaya)
 
+        # Cache the per-type location lists and coordinate tables once;
+        # _create_agents reads these instead of re-filtering the dict.
+        # KD-trees make the nearest-station and izakayas-within-radius
+        # queries O(log n) instead of a scan over every location per agent
+        self._stations_list = self.location_manager.get_locations_by_type('station')
+        self._izakayas_list = self.location_manager.get_locations_by_type('izakaya')
+        self._stations_xy = np.array(
+            [loc.coordinates for _, loc in self._stations_list], dtype=np.float32)
+        self._izakayas_xy = np.array(
+            [loc.coordinates for _, loc in self._izakayas_list], dtype=np.float32)
+        self._station_tree = cKDTree(self._stations_xy)
+        self._izakaya_tree = cKDTree(self._izakayas_xy)
+        # Izakaya candidates near each station, computed once for all
+        # stations; agents sharing a work station reuse the same list
+        self._station_nearby_izakayas = self._izakaya_tree.query_ball_point(
+            self._stations_xy, r=0.01)
+        # Transfer candidates depend only on the (home, work) station
+        # pair, so cache them; many agents share the same commute pair
+        self._transfer_cache: Dict[Tuple[int, int], List[Tuple[float, float]]] = {}
+
     def _create_agents(self):
         """Initialize agents with realistic locations"""
-        stations = [(loc_id, loc) for loc_id, loc in self.location_manager.locations.items()
-                   if loc.type == 'station']
-        izakayas = [(loc_id, loc) for loc_id, loc in self.location_manager.locations.items()
-                   if loc.type == 'izakaya']
+        stations = self._stations_list
+        izakayas = self._izakayas_list
 
         # Get parameters with defaults
         train_commuter_ratio = self.params.get('train_commuter_ratio', 0.9)
         avg_transfers = self.params.get('avg_transfers', 2.3)
         izakaya_probability = self.params.get('izakaya_probability', 0.7)
 
+        # Station selection weights depend only on station names, so
+        # compute them once instead of per agent
+        self._station_weights = np.fromiter(
+            (1.5 if ('Tokyo' in sid or 'Shinjuku' in sid) else 1.0
+             for sid, _ in stations),
+            dtype=np.float64, count=len(stations))
+        self._station_weights /= self._station_weights.sum()
+        self._station_cdf = np.cumsum(self._station_weights)
+
+        # Draw every per-agent random decision up front as array-sized
+        # calls; the loop below just indexes into them
+        rng = self.rng
+        uses_train_arr = rng.random(self.num_agents) < train_commuter_ratio
+        goes_to_izakaya_arr = rng.random(self.num_agents) < izakaya_probability
+        num_transfers_arr = np.clip(
+            rng.poisson(avg_transfers, self.num_agents), 0, 5)
+        # Home neighborhoods and home coordinates for the whole population
+        # in one weighted draw plus one vectorized disc sample
+        home_neighborhoods = sample_neighborhoods(self.num_agents, rng)
+        home_locs = generate_home_locations_batch(home_neighborhoods, rng)
+        # Inverse-CDF sampling of all work stations in one searchsorted
+        # call, replacing a weighted np.random.choice per agent
+        work_station_idxs = np.searchsorted(
+            self._station_cdf, rng.random(self.num_agents))
+        work_offsets = rng.uniform(-0.005, 0.005, size=(self.num_agents, 2))
+        izakaya_picks = rng.random(self.num_agents)
+        random_work_locs = np.column_stack((
+            rng.uniform(self.city_bounds[0][0], self.city_bounds[1][0],
+                        self.num_agents),
+            rng.uniform(self.city_bounds[0][1], self.city_bounds[1][1],
+                        self.num_agents),
+        ))
+
         for i in range(self.num_agents):
-            # Generate home location in a neighborhood
-            neighborhood = select_random_neighborhood()
-            home_loc = generate_home_location(neighborhood)
+            home_loc = tuple(home_locs[i])
 
             # Determine if agent uses train
-            uses_train = np.random.random() < train_commuter_ratio
+            uses_train = uses_train_arr[i]
 
             if uses_train:
                 # Assign nearest station to home
-                home_station_id, home_station = min(stations,
-                                                  key=lambda s: self._distance(home_loc, s[1].coordinates))
-
-                # Create weights for station selection
-                station_weights = []
-                for station_id, _ in stations:
-                    weight = 1.5 if ('Tokyo' in station_id or 'Shinjuku' in station_id) else 1.0
-                    station_weights.append(weight)
-
-                # Normalize weights
-                station_weights = np.array(station_weights, dtype=float)
-                station_weights /= station_weights.sum()
+                _, nearest_idx = self._station_tree.query(home_loc)
+                home_station_idx = int(nearest_idx)
+                home_station_id, home_station = stations[home_station_idx]
 
-                # Select work station
-                selected_idx = np.random.choice(len(stations), p=station_weights)
+                # Work station drawn in the batched pass above
+                selected_idx = int(work_station_idxs[i])
                 work_station_id, work_station = stations[selected_idx]
 
                 # Generate transfer stations
-                num_transfers = np.random.poisson(avg_transfers)
-                num_transfers = min(max(num_transfers, 0), 5)  # Limit to 0-5 transfers
+                num_transfers = int(num_transfers_arr[i])
 
                 # Select transfer stations along the route
                 transfer_stations = self._select_transfer_stations(
-                    home_station.coordinates,
-                    work_station.coordinates,
-                    stations,
+                    home_station_idx,
+                    int(selected_idx),
                     num_transfers
                 )
             else:
@@ -141,22 +193,20 @@ class TokyoSimulation:
 
             # Work location near station or random location
             if work_station:
-                work_loc = self._add_offset(work_station.coordinates, max_offset=0.005)
-            else:
                 work_loc = (
-                    np.random.uniform(self.city_bounds[0][0], self.city_bounds[1][0]),
-                    np.random.uniform(self.city_bounds[0][1], self.city_bounds[1][1])
+                    work_station.coordinates[0] + work_offsets[i, 0],
+                    work_station.coordinates[1] + work_offsets[i, 1]
                 )
+            else:
+                work_loc = tuple(random_work_locs[i])
 
             # Assign izakaya near work location if agent goes to izakayas
-            goes_to_izakaya = np.random.random() < izakaya_probability
+            goes_to_izakaya = goes_to_izakaya_arr[i]
             if goes_to_izakaya and work_station:
-                nearby_izakayas = [
-                    iz for iz in izakayas
-                    if self._distance(iz[1].coordinates, work_station.coordinates) < 0.01
-                ]
-                if nearby_izakayas:
-                    _, izakaya = nearby_izakayas[np.random.randint(len(nearby_izakayas))]
+                nearby_idx = self._station_nearby_izakayas[selected_idx]
+                if len(nearby_idx):
+                    _, izakaya = izakayas[
+                        nearby_idx[int(izakaya_picks[i] * len(nearby_idx))]]
                     izakaya_loc = izakaya.coordinates
                 else:
                     izakaya_loc = work_station.coordinates
@@ -174,101 +224,167 @@ class TokyoSimulation:
                 uses_train=uses_train,
                 goes_to_izakaya=goes_to_izakaya
             )
-            agent.generate_daily_schedule()
             self.agents.append(agent)
 
+        # Generate all schedules in one batched pass
+        build_population_schedules(self.agents, rng=self.rng)
+
+    def _transfer_candidates(self, start_idx: int, end_idx: int) -> List[Tuple[float, float]]:
+        """Stations between two stations, sorted by distance from start (cached)"""
+        key = (start_idx, end_idx)
+        cached = self._transfer_cache.get(key)
+        if cached is not None:
+            return cached
+
+        # Vectorized projection of every station onto the start->end
+        # segment: in-segment projection plus bounded perpendicular
+        # offset, on squared quantities (same test as point_is_between)
+        start = self._stations_xy[start_idx]
+        end = self._stations_xy[end_idx]
+        v = end - start
+        w = self._stations_xy - start
+        vv = float(v @ v)
+        if vv == 0.0:
+            candidates = []
+        else:
+            vw = w @ v
+            ww = np.einsum('ij,ij->i', w, w)
+            perp_sq = ww - (vw * vw) / vv
+            mask = (vw >= 0.0) & (vw <= vv) & (perp_sq < 0.1 ** 2 * vv)
+            candidate_idxs = np.flatnonzero(mask)
+            # Sort by distance from start (squared is order-preserving)
+            candidate_idxs = candidate_idxs[np.argsort(ww[candidate_idxs])]
+            candidates = [tuple(self._stations_xy[i]) for i in candidate_idxs]
+
+        self._transfer_cache[key] = candidates
+        return candidates
+
     def _select_transfer_stations(
         self,
-        start_coords: Tuple[float, float],
-        end_coords: Tuple[float, float],
-        stations: List[Tuple[str, Location]],
+        start_idx: int,
+        end_idx: int,
         num_transfers: int
     ) -> List[Tuple[float, float]]:
         """Select reasonable transfer stations between start and end stations"""
         if num_transfers == 0:
             return []
 
-        potential_transfers = [
-            s for s in stations
-            if self._is_between(s[1].coordinates, start_coords, end_coords)
-        ]
+        potential_transfers = self._transfer_candidates(start_idx, end_idx)
 
         transfer_stations = []
         if potential_transfers:
-            # Sort by distance from start
-            potential_transfers.sort(
-                key=lambda s: self._distance(start_coords, s[1].coordinates)
-            )
-
             # Select evenly spaced stations
-            if num_transfers > 0:
-                step = len(potential_transfers) // (num_transfers + 1)
-                if step > 0:
-                    for i in range(num_transfers):
-                        idx = min((i + 1) * step, len(potential_transfers) - 1)
-                        transfer_stations.append(potential_transfers[idx][1].coordinates)
+            step = len(potential_transfers) // (num_transfers + 1)
+            if step > 0:
+                for i in range(num_transfers):
+                    idx = min((i + 1) * step, len(potential_transfers) - 1)
+                    transfer_stations.append(potential_transfers[idx])
 
         return transfer_stations
 
     def _initialize_idea_spread(self):
         """Select initial agents who have the idea"""
-        initial_spreaders = np.random.choice(
-            self.agents,
+        # Draw integer indices rather than sampling the object list, which
+        # would force NumPy through a slow object-dtype array
+        spreader_idxs = self.rng.choice(
+            self.num_agents,
             size=self.params.get('initial_infected', 1),
             replace=False
         )
-        for agent in initial_spreaders:
-            agent.has_idea = True
+        self.arrays.has_idea[spreader_idxs] = True
 
     def step(self):
         """Advance simulation by one time step"""
         self.current_time += 1
 
-        # Move agents
-        for agent in self.agents:
-            agent.move(self.current_time % 24)  # Pass hour of day
+        # Fused move + interact kernel: gathers each agent's hourly
+        # location and runs grouped transmission in a single pass. The
+        # tick's Bernoulli uniforms come from the simulation's generator
+        # so a seeded run replays exactly; Numba's internal per-thread
+        # RNG cannot be seeded from here
+        self.rng.random(out=self.arrays._rand_buf)
+        step_agents(
+            self.arrays.hourly_locations,
+            self.arrays.hourly_loc_ids,
+            self.arrays.hourly_rate_mult,
+            self.arrays.locations_xy,
+            self.arrays.current_loc_ids,
+            self.arrays.has_idea,
+            self.current_time % 24,
+            self.params.get('transmission_rate', 0.05),
+            self.arrays._rand_buf
+        )
+
+    def run(self, num_steps: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Advance the simulation num_steps ticks, recording history.
+
+        Positions and idea flags are written into preallocated arrays —
+        (num_steps, N, 2) float32 and (num_steps, N) bool — instead of a
+        per-tick list of state dicts, so a week of 1000 agents stays a
+        couple of megabytes of flat memory with no per-agent tuples.
+        """
+        history_locs = np.empty((num_steps, self.num_agents, 2), dtype=np.float32)
+        history_idea = np.empty((num_steps, self.num_agents), dtype=np.bool_)
 
-        # Process interactions
-        self._process_interactions()
+        for t in range(num_steps):
+            self.step()
+            history_locs[t] = self.arrays.locations_xy
+            history_idea[t] = self.arrays.has_idea
+
+        return history_locs, history_idea
 
     def _process_interactions(self):
         """Handle agent interactions and idea transmission"""
         base_transmission_rate = self.params.get('transmission_rate', 0.05)
 
-        # Group agents by location
-        location_groups: Dict[Tuple[float, float], List[TokyoResident]] = {}
-        for agent in self.agents:
-            loc = agent.current_location
-            if loc not in location_groups:
-                location_groups[loc] = []
-            location_groups[loc].append(agent)
+        # Group agents by spatial-hash cell with one argsort over the
+        # integer cell IDs; groups become contiguous slices of the
+        # permutation, with no dict or tuple hashing involved
+        keys = self.arrays.current_loc_ids
+        order = np.argsort(keys, kind='stable')
+        _, group_starts = np.unique(keys[order], return_index=True)
+        group_bounds = np.append(group_starts, self.num_agents)
+
+        # Build per-agent spreader rates (location-type and density modifiers),
+        # then run the compiled all-pairs kernel once for the whole tick
+        rates = np.empty(self.num_agents, dtype=np.float64)
+        for g in range(len(group_starts)):
+            group = order[group_bounds[g]:group_bounds[g + 1]]
 
-        # Process interactions for each location
-        for agents in location_groups.values():
             # Additional density-based modification
-            group_size = len(agents)
+            group_size = len(group)
             density_multiplier = min(group_size / 10, 2.0)  # Cap at 2x for large groups
 
-            for agent in agents:
-                agent.interact(agents, base_transmission_rate * density_multiplier)
+            for idx in group:
+                rates[idx] = (base_transmission_rate *
+                              density_multiplier *
+                              self.agents[idx].transmission_modifier())
+
+        spread_ideas(self.arrays.locations_xy, self.arrays.has_idea, rates)
 
     def get_state(self) -> Dict:
         """Return current simulation state"""
+        # Everything here reads straight from the SoA arrays: the count
+        # and rate are single vectorized reductions, and the location list
+        # is built from one bulk tolist() per array instead of a property
+        # dispatch per agent
+        infected_count = int(self.arrays.has_idea.sum())
         return {
             'time': self.current_time,
-            'infected_count': sum(1 for agent in self.agents if agent.has_idea),
-            'agent_locations': [(agent.current_location, agent.has_idea)
-                              for agent in self.agents],
-            'infection_rate': sum(agent.has_idea for agent in self.agents) / len(self.agents)
+            'infected_count': infected_count,
+            'agent_locations': [
+                (tuple(loc), flag)
+                for loc, flag in zip(self.arrays.locations_xy.tolist(),
+                                     self.arrays.has_idea.tolist())
+            ],
+            'infection_rate': infected_count / self.num_agents
         }
 
     @staticmethod
     def _distance(coord1: Tuple[float, float], coord2: Tuple[float, float]) -> float:
         """Calculate simple distance between two coordinates"""
-        return np.sqrt(
-            (coord1[0] - coord2[0])**2 +
-            (coord1[1] - coord2[1])**2
-        )
+        return point_distance(coord1[0], coord1[1], coord2[0], coord2[1])
 
     @staticmethod
     def _add_offset(coords: Tuple[float, float], max_offset: float = 0.005) -> Tuple[float, float]:
@@ -286,17 +402,5 @@ class TokyoSimulation:
         tolerance: float = 0.1
     ) -> bool:
         """Check if a point is roughly between start and end points"""
-        d_start_end = np.sqrt(
-            (start[0] - end[0])**2 +
-            (start[1] - end[1])**2
-        )
-        d_start_point = np.sqrt(
-            (start[0] - point[0])**2 +
-            (start[1] - point[1])**2
-        )
-        d_point_end = np.sqrt(
-            (point[0] - end[0])**2 +
-            (point[1] - end[1])**2
-        )
-
-        return abs(d_start_point + d_point_end - d_start_end) < (d_start_end * tolerance)
+        return point_is_between(point[0], point[1], start[0], start[1],
+                                end[0], end[1], tolerance)
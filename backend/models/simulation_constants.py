@@ -0,0 +1,36 @@
+import numpy as np
+
+# Major stations with accurate coordinates. Frozen at import so every
+# TokyoSimulation shares one table instead of rebuilding the list (and
+# its derived arrays) per /simulate request
+MAJOR_STATIONS = (
+    ("Tokyo", (35.6812, 139.7671)),
+    ("Shinjuku", (35.6896, 139.7006)),
+    ("Shibuya", (35.6580, 139.7016)),
+    ("Ikebukuro", (35.7295, 139.7109)),
+    ("Shinagawa", (35.6284, 139.7387)),
+    ("Ueno", (35.7141, 139.7774)),
+    ("Akihabara", (35.6982, 139.7731)),
+
+    # Additional stations for transfers
+    ("Harajuku", (35.6702, 139.7027)),
+    ("Ebisu", (35.6462, 139.7103)),
+    ("Meguro", (35.6340, 139.7157)),
+    ("Gotanda", (35.6262, 139.7233)),
+    ("Osaki", (35.6197, 139.7286)),
+    ("Tamachi", (35.6457, 139.7475)),
+    ("Hamamatsucho", (35.6553, 139.7571)),
+    ("Yurakucho", (35.6749, 139.7628)),
+    ("Kanda", (35.6918, 139.7712)),
+    ("Nippori", (35.7281, 139.7707)),
+    ("Komagome", (35.7373, 139.7468)),
+    ("Tabata", (35.7381, 139.7608)),
+)
+
+STATION_NAMES = tuple(name for name, _ in MAJOR_STATIONS)
+STATION_COORDS = np.array([coords for _, coords in MAJOR_STATIONS],
+                          dtype=np.float32)
+STATION_COORDS.setflags(write=False)
+
+# Izakaya clusters around each station
+IZAKAYAS_PER_STATION = 3
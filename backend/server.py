@@ -1,13 +1,16 @@
 import sys
 import os
+import hashlib
+import json
+import traceback
 current_dir = os.path.dirname(os.path.abspath(__file__))
 sys.path.append(current_dir)
 
 from flask import Flask, jsonify, request, send_from_directory, send_file
 from flask_cors import CORS
 import numpy as np
-import uuid
 from models.simulation import TokyoSimulation
+from models.kernels import warm_kernels
 from visualization.video_generator import SimulationVideoGenerator, VideoConfig
 from dataclasses import asdict
 
@@ -17,6 +20,9 @@ CORS(app)
 # Ensure the static directories exist
 os.makedirs('static/simulations', exist_ok=True)
 
+# Compile (or cache-load) the simulation kernels before serving requests
+warm_kernels()
+
 @app.route('/static/simulations/<path:filename>')
 def serve_simulation(filename):
     """Serve generated simulation videos"""
@@ -80,6 +86,26 @@ def simulate():
         # Get simulation parameters from request
         params = request.json or {}
 
+        # Identical parameters produce an identical video when a seed is
+        # supplied (and a representative one otherwise), so key the
+        # output files by a digest of the canonical params and skip the
+        # whole run on a hit
+        cache_key = hashlib.blake2b(
+            json.dumps(params, sort_keys=True).encode(), digest_size=16
+        ).hexdigest()
+        video_path = f"static/simulations/{cache_key}.mp4"
+        stats_path = f"static/simulations/{cache_key}.json"
+
+        if os.path.exists(video_path) and os.path.exists(stats_path):
+            with open(stats_path) as f:
+                statistics = json.load(f)
+            return jsonify({
+                "status": "success",
+                "video_url": f"/{video_path}",
+                "statistics": statistics,
+                "cached": True
+            })
+
         # Create simulation
         simulation = TokyoSimulation(
                     num_agents=params.get('num_agents', 1000),
@@ -91,15 +117,14 @@ def simulate():
                         'izakaya_probability': params.get('izakaya_probability', 0.7),
                         'izakaya_capacity': params.get('izakaya_capacity', 50),
                         'train_commuter_ratio': params.get('train_commuter_ratio', 0.9),
-                        'avg_transfers': params.get('avg_transfers', 2.3)
+                        'avg_transfers': params.get('avg_transfers', 2.3),
+                        'seed': params.get('seed')
                     }
                 )
 
-        # Run simulation for one week (24 * 7 hours)
-        states = []
-        for _ in range(24 * 7):
-            simulation.step()
-            states.append(simulation.get_state())
+        # Run simulation for one week (24 * 7 hours); history comes back
+        # as flat ndarrays rather than a list of per-tick state dicts
+        history_locs, history_idea = simulation.run(24 * 7)
 
         # Generate video
         video_config = VideoConfig(
@@ -110,11 +135,7 @@ def simulate():
 
         video_generator = SimulationVideoGenerator(video_config)
 
-        # Generate unique filename
-        video_id = str(uuid.uuid4())
-        video_path = f"static/simulations/{video_id}.mp4"
-
-        success = video_generator.generate_video(states, video_path)
+        success = video_generator.generate_video(history_locs, history_idea, video_path)
 
         if not success:
             return jsonify({
@@ -122,14 +143,18 @@ def simulate():
                 "message": "Failed to generate video"
             }), 500
 
+        statistics = {
+            "final_infection_rate": float(history_idea[-1].mean()),
+            "total_infected": int(history_idea[-1].sum()),
+            "simulation_duration_days": 7
+        }
+        with open(stats_path, 'w') as f:
+            json.dump(statistics, f)
+
         return jsonify({
             "status": "success",
-            "video_url": f"/static/simulations/{video_id}.mp4",
-            "statistics": {
-                "final_infection_rate": states[-1]['infection_rate'],
-                "total_infected": states[-1]['infected_count'],
-                "simulation_duration_days": 7
-            }
+            "video_url": f"/{video_path}",
+            "statistics": statistics
         })
 
     except Exception as e:
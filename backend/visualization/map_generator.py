@@ -1,7 +1,10 @@
 from typing import List, Tuple, Dict
+import base64
 import folium
 from folium.plugins import HeatMap, TimestampedGeoJson
+import cv2
 import numpy as np
+import orjson
 from datetime import datetime, timedelta
 
 class TokyoMapGenerator:
@@ -53,41 +56,122 @@ class TokyoMapGenerator:
                 icon=folium.Icon(color='red', icon=loc_type, prefix='fa')
             ).add_to(map_obj)
             
+    # Shared per-feature style objects: two dicts total instead of one
+    # allocation per (agent, hour)
+    _IDEA_STYLE = {'color': 'red', 'radius': 5}
+    _NO_IDEA_STYLE = {'color': 'blue', 'radius': 5}
+
     def generate_timestamped_data(
         self,
         simulation_states: List[Dict],
         start_time: datetime
     ) -> Dict:
         """Generate GeoJSON for animated visualization"""
-        features = []
-        
+        num_agents = (len(simulation_states[0]['agent_locations'])
+                      if simulation_states else 0)
+        features = [None] * (len(simulation_states) * num_agents)
+        # Constant strings interned once, not rebuilt per feature
+        popups = [f'Agent {idx}' for idx in range(num_agents)]
+        out = 0
+
         for i, state in enumerate(simulation_states):
-            time = start_time + timedelta(hours=i)
-            
+            # One ISO timestamp per hour, shared by every agent feature
+            time = (start_time + timedelta(hours=i)).isoformat()
+
             for agent_idx, (location, has_idea) in enumerate(state['agent_locations']):
-                feature = {
+                features[out] = {
                     'type': 'Feature',
                     'geometry': {
                         'type': 'Point',
                         'coordinates': [location[1], location[0]]  # lon, lat
                     },
                     'properties': {
-                        'time': time.isoformat(),
+                        'time': time,
                         'icon': 'circle',
-                        'popup': f'Agent {agent_idx}',
-                        'style': {
-                            'color': 'red' if has_idea else 'blue',
-                            'radius': 5
-                        }
+                        'popup': popups[agent_idx],
+                        'style': self._IDEA_STYLE if has_idea else self._NO_IDEA_STYLE
                     }
                 }
-                features.append(feature)
-                
+                out += 1
+
         return {
             'type': 'FeatureCollection',
             'features': features
         }
+
+    def write_timestamped_data(
+        self,
+        simulation_states: List[Dict],
+        start_time: datetime,
+        save_path: str
+    ) -> None:
+        """Serialize the animated GeoJSON straight to disk with orjson"""
+        data = self.generate_timestamped_data(simulation_states, start_time)
+        with open(save_path, 'wb') as f:
+            f.write(orjson.dumps(data, option=orjson.OPT_SERIALIZE_NUMPY))
         
+    def rasterize_frames(
+        self,
+        simulation_states: List[Dict],
+        bounds: Tuple[Tuple[float, float], Tuple[float, float]] = ((35.5, 139.4), (35.8, 139.9)),
+        size: Tuple[int, int] = (256, 256)
+    ) -> np.ndarray:
+        """
+        Rasterize infected-agent density into a (frames, H, W) uint16 stack.
+
+        Each hour becomes one scatter-add over integer pixel indices
+        instead of one GeoJSON feature dict per agent, so a week of 1000
+        agents is a few vectorized passes rather than 168k dict
+        allocations. Counts accumulate in uint16 — uint8 would wrap at
+        256 co-located agents, rendering dense cells as empty.
+        """
+        (min_lat, min_lon), (max_lat, max_lon) = bounds
+        height, width = size
+        frames = np.zeros((len(simulation_states), height, width), dtype=np.uint16)
+
+        for t, state in enumerate(simulation_states):
+            coords = np.asarray([loc for loc, _ in state['agent_locations']],
+                                dtype=np.float32)
+            has_idea = np.fromiter(
+                (flag for _, flag in state['agent_locations']),
+                dtype=np.bool_, count=len(state['agent_locations']))
+
+            x = ((coords[:, 1] - min_lon) / (max_lon - min_lon) * (width - 1))
+            y = ((max_lat - coords[:, 0]) / (max_lat - min_lat) * (height - 1))
+            x = np.clip(x.astype(np.int32), 0, width - 1)
+            y = np.clip(y.astype(np.int32), 0, height - 1)
+
+            np.add.at(frames[t], (y[has_idea], x[has_idea]), 1)
+
+        return frames
+
+    def _frame_overlay_uri(self, frame: np.ndarray) -> str:
+        """Encode one density frame as a red-tinted PNG data URI"""
+        # uint32 math: a uint16 count of 1024+ would wrap at * 64
+        alpha = np.minimum(frame.astype(np.uint32) * 64, 255).astype(np.uint8)
+        rgba = np.zeros((*frame.shape, 4), dtype=np.uint8)
+        rgba[..., 2] = 255  # red in BGRA order
+        rgba[..., 3] = alpha
+        _, png = cv2.imencode('.png', rgba)
+        return 'data:image/png;base64,' + base64.b64encode(png.tobytes()).decode('ascii')
+
+    def add_density_overlays(
+        self,
+        map_obj: folium.Map,
+        frames: np.ndarray,
+        bounds: Tuple[Tuple[float, float], Tuple[float, float]] = ((35.5, 139.4), (35.8, 139.9)),
+        stride: int = 24
+    ):
+        """Attach rasterized density frames as toggleable image overlays"""
+        for t in range(0, len(frames), stride):
+            folium.raster_layers.ImageOverlay(
+                image=self._frame_overlay_uri(frames[t]),
+                bounds=[list(bounds[0]), list(bounds[1])],
+                opacity=0.6,
+                name=f'Idea Density (hour {t})',
+                show=(t == 0)
+            ).add_to(map_obj)
+
     def create_animated_map(
         self,
         simulation_states: List[Dict],
@@ -109,19 +193,11 @@ class TokyoMapGenerator:
             }
         )
         
-        # Add animated agent movements
-        timestamped_data = self.generate_timestamped_data(
-            simulation_states,
-            datetime.now()
-        )
-        
-        TimestampedGeoJson(
-            timestamped_data,
-            period='PT1H',  # 1 hour between frames
-            duration='PT10M',  # Time each frame is displayed
-            transition_time=200,  # Transition time between frames
-            auto_play=True
-        ).add_to(m)
+        # Add rasterized density overlays (one per day) in place of the
+        # per-agent-per-hour TimestampedGeoJson layer, whose N*T feature
+        # dicts dominated map generation time and output size
+        frames = self.rasterize_frames(simulation_states)
+        self.add_density_overlays(m, frames)
         
         # Add final heatmap layer
         final_state = simulation_states[-1]
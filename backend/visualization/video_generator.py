@@ -3,11 +3,85 @@ import cv2
 import numpy as np
 from dataclasses import dataclass
 import folium
+import hashlib
 import os
-import io
-from PIL import Image
-
-@dataclass
+import queue
+import subprocess
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from numba import njit, prange
+
+# No fastmath here: FMA contraction could perturb the pixel transform by
+# an ulp and desync it from _coords_to_pixels' results
+@njit(parallel=True, cache=True)
+def _render_agents(frame, locs, ideas, px_offset, py_offset, lon_scale,
+                   lat_scale, disk_offsets, color_idea, color_no_idea,
+                   pixels_out):
+    """
+    Fused coordinate transform + disk draw over all agents.
+
+    One pass per agent in registers — no intermediate arrays — with
+    direct writes into the frame buffer. Also records each agent's pixel
+    position in pixels_out for callers that need it.
+    """
+    height = frame.shape[0]
+    width = frame.shape[1]
+    for i in prange(locs.shape[0]):
+        # Same folded scale+offset transform as _coords_to_pixels, kept
+        # bit-identical so delta frames agree with the full redraw
+        px = int(locs[i, 1] * lon_scale + px_offset)
+        py = int(py_offset - locs[i, 0] * lat_scale)
+        pixels_out[i, 0] = px
+        pixels_out[i, 1] = py
+        color = color_idea if ideas[i] else color_no_idea
+        for k in range(disk_offsets.shape[0]):
+            y = py + disk_offsets[k, 0]
+            x = px + disk_offsets[k, 1]
+            if 0 <= y < height and 0 <= x < width:
+                frame[y, x, 0] = color[0]
+                frame[y, x, 1] = color[1]
+                frame[y, x, 2] = color[2]
+
+@njit(parallel=True, cache=True)
+def _erase_agents(frame, base, pixels, idx, disk_offsets):
+    """Restore base-map pixels over the disks of the selected agents"""
+    height = frame.shape[0]
+    width = frame.shape[1]
+    for j in prange(idx.shape[0]):
+        i = idx[j]
+        px = pixels[i, 0]
+        py = pixels[i, 1]
+        for k in range(disk_offsets.shape[0]):
+            y = py + disk_offsets[k, 0]
+            x = px + disk_offsets[k, 1]
+            if 0 <= y < height and 0 <= x < width:
+                frame[y, x, 0] = base[y, x, 0]
+                frame[y, x, 1] = base[y, x, 1]
+                frame[y, x, 2] = base[y, x, 2]
+
+@njit(parallel=True, cache=True)
+def _paint_agents(frame, pixels, ideas, idx, disk_offsets, color_idea,
+                  color_no_idea):
+    """Draw disks for the selected agents at precomputed pixel positions"""
+    height = frame.shape[0]
+    width = frame.shape[1]
+    for j in prange(idx.shape[0]):
+        i = idx[j]
+        px = pixels[i, 0]
+        py = pixels[i, 1]
+        color = color_idea if ideas[i] else color_no_idea
+        for k in range(disk_offsets.shape[0]):
+            y = py + disk_offsets[k, 0]
+            x = px + disk_offsets[k, 1]
+            if 0 <= y < height and 0 <= x < width:
+                frame[y, x, 0] = color[0]
+                frame[y, x, 1] = color[1]
+                frame[y, x, 2] = color[2]
+
+# Frozen + slots: render settings never change after construction, and
+# slot storage makes the remaining attribute reads a C-level lookup
+@dataclass(frozen=True, slots=True)
 class VideoConfig:
     width: int = 1280
     height: int = 720
@@ -16,24 +90,134 @@ class VideoConfig:
     idea_color: tuple = (0, 255, 0)  # Green for agents with idea
     no_idea_color: tuple = (50, 50, 255)  # Red for agents without idea
     background_color: tuple = (25, 25, 25)  # Dark background for text overlay
+    debug: bool = False  # Per-frame progress output in the encode loop
 
 class SimulationVideoGenerator:
-    # Class variable to store the cached map
-    _cached_base_frame = None
+    # Process-level cache of loaded base maps, keyed by the same hash as
+    # the on-disk cache. Entries are read-only and shared by reference:
+    # repeated constructions skip both the disk load and a per-instance
+    # copy, since only _frame_buf ever needs to be writable
+    _cached_base_frames: Dict[str, np.ndarray] = {}
+
+    # Geographic bounds of the rendered area ((min_lat, min_lon), (max_lat, max_lon))
+    TOKYO_BOUNDS = ((35.5, 139.4), (35.8, 139.9))
 
-    def __init__(self, config: VideoConfig = None):
+    # Stats-overlay font settings (shared by the glyph cache)
+    FONT = cv2.FONT_HERSHEY_SIMPLEX
+    FONT_SCALE = 0.8
+    FONT_THICKNESS = 2
+
+    def __init__(self, config: VideoConfig = None, base_frame: np.ndarray = None):
         self.config = config or VideoConfig()
-        self.base_frame = self._get_base_frame()
+        # Render workers inject a shared-memory base map here instead of
+        # hitting the disk/folium cache path per process
+        self.base_frame = (base_frame if base_frame is not None
+                           else self._get_base_frame())
+        # Constant factors of the lat/lon -> pixel transform, computed
+        # once and folded into scale+offset form: the transform becomes
+        # two multiply-adds with no per-call bounds arithmetic
+        (min_lat, min_lon), (max_lat, max_lon) = self.TOKYO_BOUNDS
+        self._lon_scale = (self.config.width - 20) / (max_lon - min_lon)
+        self._lat_scale = (self.config.height - 20) / (max_lat - min_lat)
+        self._px_offset = 10 - min_lon * self._lon_scale
+        self._py_offset = max_lat * self._lat_scale + 10
+        # (dy, dx) offsets covering a filled disk of agent_radius, built
+        # once; drawing becomes a broadcast-add plus one fancy-indexed
+        # write per color instead of a cv2.circle call per agent
+        r = self.config.agent_radius
+        self._disk_offsets = np.array(
+            [(dy, dx) for dy in range(-r, r + 1) for dx in range(-r, r + 1)
+             if dy * dy + dx * dx <= r * r],
+            dtype=np.int32)
+        # Colors as uint8 arrays for the njit render kernel
+        self._idea_color = np.array(self.config.idea_color, dtype=np.uint8)
+        self._no_idea_color = np.array(self.config.no_idea_color, dtype=np.uint8)
+        # Persistent frame buffer: each frame resets it from base_frame
+        # with one copyto instead of allocating ~2.7MB per frame. Both
+        # writer paths (VideoWriter and ffmpeg stdin) consume frames
+        # zero-copy only when C-contiguous, so pin that down here and
+        # keep create_frame free of stride-changing views
+        self.base_frame = np.ascontiguousarray(self.base_frame)
+        self._frame_buf = np.empty_like(self.base_frame)
+        assert self._frame_buf.flags['C_CONTIGUOUS']
+        # Last frame's per-agent pixel positions and idea flags, for
+        # delta rendering: unchanged agents cost zero pixel writes
+        self._prev_pixels = None
+        self._prev_ideas = None
+        # Frame rect dirtied by last frame's stats overlay (panel darken
+        # plus text, which can extend past the panel), as (y0, y1, x0, x1)
+        self._overlay_box = None
+        # Glyph cache for the stats overlay: each character the panel can
+        # display is rasterized once at startup, so per-frame text becomes
+        # masked slice writes instead of cv2.putText's stroke tessellation
+        self._glyphs = {}
+        margin = self.FONT_THICKNESS + 1  # room for stroke overhang
+        for ch in '0123456789:,.% DayIdeAoptinR':
+            (w, h), baseline = cv2.getTextSize(
+                ch, self.FONT, self.FONT_SCALE, self.FONT_THICKNESS)
+            # putText advances by less than a lone char's padded width, so
+            # measure the true advance from a two-char string
+            advance = (cv2.getTextSize(ch + ch, self.FONT, self.FONT_SCALE,
+                                       self.FONT_THICKNESS)[0][0] - w)
+            scratch = np.zeros((h + baseline + 2 * margin, w + 2 * margin),
+                               dtype=np.uint8)
+            cv2.putText(scratch, ch, (margin, h + margin), self.FONT,
+                        self.FONT_SCALE, 255, self.FONT_THICKNESS)
+            # putText anti-aliases, so keep the coverage as an alpha
+            # channel rather than a binary mask
+            alpha = scratch.astype(np.float32)[:, :, None] / 255.0
+            self._glyphs[ch] = (alpha, h + margin, margin, advance)
+        # Whole strings repeat across frames (168 unique clock strings a
+        # week; rates quantized to 0.1% by their format), so compose each
+        # unique label from the glyphs once and cache the full stamp
+        self._text_cache = {}
+
+    # Folium parameters of the rendered base map; part of the cache key
+    MAP_TILES = 'CartoDB dark_matter'
+    MAP_CENTER = (35.65, 139.65)
+    MAP_ZOOM = 11
+
+    def _base_frame_cache_path(self) -> str:
+        """Cache file for the base map at this config's resolution"""
+        key = hashlib.blake2b(
+            repr((self.MAP_TILES, self.MAP_CENTER, self.MAP_ZOOM,
+                  self.config.width, self.config.height)).encode(),
+            digest_size=8
+        ).hexdigest()
+        return os.path.join('static', f'base_{key}.npy')
 
     def _get_base_frame(self) -> np.ndarray:
-        """Get the base frame from cached file or create new"""
-        cached_map_path = os.path.join('static', 'base_map.png')
+        """Get the base frame, memoized read-only at the class level"""
+        npy_path = self._base_frame_cache_path()
+        frame = self._cached_base_frames.get(npy_path)
+        if frame is None:
+            frame = np.ascontiguousarray(self._load_base_frame())
+            frame.flags.writeable = False
+            SimulationVideoGenerator._cached_base_frames[npy_path] = frame
+        return frame
 
+    def _load_base_frame(self) -> np.ndarray:
+        """Load the base frame from cached file or create new"""
+        # Primary cache: the resized BGR array itself, keyed by map
+        # parameters and resolution, so a hit is one mmap'd load with no
+        # PNG decode or resize
+        npy_path = self._base_frame_cache_path()
+        if os.path.exists(npy_path):
+            print("Loading cached Tokyo map...")
+            frame = np.load(npy_path, mmap_mode='r')
+            if frame.shape == (self.config.height, self.config.width, 3):
+                print(f"Successfully loaded cached map with shape: {frame.shape}")
+                return frame.copy()
+
+        # Legacy single-resolution PNG cache
+        cached_map_path = os.path.join('static', 'base_map.png')
         if os.path.exists(cached_map_path):
             print("Loading cached Tokyo map...")
             frame = cv2.imread(cached_map_path)
             if frame is not None:
                 frame = cv2.resize(frame, (self.config.width, self.config.height))
+                os.makedirs('static', exist_ok=True)
+                np.save(npy_path, frame)
                 print(f"Successfully loaded cached map with shape: {frame.shape}")
                 return frame
 
@@ -41,9 +225,9 @@ class SimulationVideoGenerator:
         try:
             # Create Folium map
             m = folium.Map(
-                location=[35.65, 139.65],  # Tokyo center
-                zoom_start=11,
-                tiles='CartoDB dark_matter',
+                location=list(self.MAP_CENTER),
+                zoom_start=self.MAP_ZOOM,
+                tiles=self.MAP_TILES,
                 width=self.config.width,
                 height=self.config.height
             )
@@ -51,17 +235,17 @@ class SimulationVideoGenerator:
             # Get PNG data
             img_data = m._to_png(5)
 
-            # Convert to PIL Image
-            img = Image.open(io.BytesIO(img_data))
-
-            # Convert PIL Image to numpy array
-            frame = cv2.cvtColor(np.array(img), cv2.COLOR_RGB2BGR)
+            # Decode straight to BGR uint8, skipping the PIL round-trip
+            # and its RGB->BGR conversion pass
+            frame = cv2.imdecode(np.frombuffer(img_data, dtype=np.uint8),
+                                 cv2.IMREAD_COLOR)
 
             # Resize to match video dimensions
             frame = cv2.resize(frame, (self.config.width, self.config.height))
 
             # Save the generated map for future use
             os.makedirs('static', exist_ok=True)
+            np.save(npy_path, frame)
             cv2.imwrite(cached_map_path, frame)
             print(f"Generated and cached new map with shape: {frame.shape}")
 
@@ -92,11 +276,10 @@ class SimulationVideoGenerator:
             # Get PNG data
             img_data = m._to_png(5)
 
-            # Convert to PIL Image
-            img = Image.open(io.BytesIO(img_data))
-
-            # Convert PIL Image to numpy array
-            frame = cv2.cvtColor(np.array(img), cv2.COLOR_RGB2BGR)
+            # Decode straight to BGR uint8, skipping the PIL round-trip
+            # and its RGB->BGR conversion pass
+            frame = cv2.imdecode(np.frombuffer(img_data, dtype=np.uint8),
+                                 cv2.IMREAD_COLOR)
 
             # Resize to match video dimensions
             frame = cv2.resize(frame, (self.config.width, self.config.height))
@@ -116,136 +299,513 @@ class SimulationVideoGenerator:
         self,
         lat: float,
         lon: float,
-        bounds: tuple = ((35.5, 139.4), (35.8, 139.9))  # Tokyo bounds
+        bounds: tuple = None
     ) -> tuple:
         """Convert geo coordinates to pixel coordinates"""
-        min_lat, min_lon = bounds[0]
-        max_lat, max_lon = bounds[1]
-
-        # Normalize coordinates to [0,1] range
-        x = (lon - min_lon) / (max_lon - min_lon)
-        y = (lat - min_lat) / (max_lat - min_lat)
-
-        # Convert to pixel coordinates
-        pixel_x = int(x * (self.config.width - 20) + 10)  # 10px padding
-        pixel_y = int((1-y) * (self.config.height - 20) + 10)  # Flip Y axis
-
-        return (pixel_x, pixel_y)
-
-    def create_frame(self, state: Dict) -> np.ndarray:
-        """Create a single frame showing agent positions and idea spread"""
-        # Start with a copy of the base frame
-        frame = self.base_frame.copy()
-
-        # Draw agents
-        for location, has_idea in state['agent_locations']:
-            pixel_pos = self._tokyo_coords_to_pixel(location[0], location[1])
-            color = self.config.idea_color if has_idea else self.config.no_idea_color
-            cv2.circle(
+        if bounds is not None and bounds != self.TOKYO_BOUNDS:
+            # Non-standard bounds: derive the transform on the fly
+            min_lat, min_lon = bounds[0]
+            max_lat, max_lon = bounds[1]
+            x = (lon - min_lon) / (max_lon - min_lon)
+            y = (lat - min_lat) / (max_lat - min_lat)
+            pixel_x = int(x * (self.config.width - 20) + 10)  # 10px padding
+            pixel_y = int((1-y) * (self.config.height - 20) + 10)  # Flip Y axis
+            return (pixel_x, pixel_y)
+
+        # Standard bounds: the precomputed scale+offset form
+        return (int(lon * self._lon_scale + self._px_offset),
+                int(self._py_offset - lat * self._lat_scale))
+
+    def _coords_to_pixels(self, latlon: np.ndarray) -> np.ndarray:
+        """
+        Convert an (N, 2) lat/lon array to (N, 2) integer pixel coordinates.
+
+        Same transform as _tokyo_coords_to_pixel but as a handful of array
+        ops over the whole population instead of one Python call per agent.
+        """
+        # float64 throughout, matching the scalar path and render kernel
+        # bit-for-bit so delta state agrees with full redraws
+        lat = latlon[:, 0].astype(np.float64)
+        lon = latlon[:, 1].astype(np.float64)
+        px = (lon * self._lon_scale + self._px_offset).astype(np.int32)
+        py = (self._py_offset - lat * self._lat_scale).astype(np.int32)
+        return np.stack((px, py), axis=1)
+
+    def _scatter_disks(self, frame: np.ndarray, points: np.ndarray, color: tuple) -> None:
+        """Paint a filled disk of agent_radius at every point in one write"""
+        if len(points) == 0:
+            return
+        ys = np.clip((points[:, 1, None] + self._disk_offsets[:, 0]).ravel(),
+                     0, frame.shape[0] - 1)
+        xs = np.clip((points[:, 0, None] + self._disk_offsets[:, 1]).ravel(),
+                     0, frame.shape[1] - 1)
+        frame[ys, xs] = color
+
+    def _draw_text(self, frame: np.ndarray, text: str, x: int, y: int,
+                   color: tuple) -> tuple:
+        """
+        Blit text from the glyph cache at (x, y) baseline coordinates.
+
+        Matches cv2.putText's placement, advance and anti-aliasing for
+        the cached font, but the whole string is one cached alpha stamp
+        composited in a single pass instead of a fresh stroke
+        rasterization per character. Returns the touched (y0, y1, x0, x1)
+        rect so the delta renderer can restore it next frame.
+        """
+        stamp = self._text_cache.get(text)
+        if stamp is None:
+            stamp = self._compose_text_stamp(text)
+            self._text_cache[text] = stamp
+        alpha, ascent, margin = stamp
+        h, w = alpha.shape[:2]
+        y0 = y - ascent
+        x0 = x - margin
+        roi = frame[y0:y0 + h, x0:x0 + w]
+        if roi.shape[:2] != (h, w):
+            return (y0, y0, x0, x0)
+        color_arr = np.asarray(color, dtype=np.float32)
+        roi[:] = roi * (1.0 - alpha) + color_arr * alpha
+        return (y0, y0 + h, x0, x0 + w)
+
+    def _compose_text_stamp(self, text: str):
+        """Paste cached glyph stamps into one alpha canvas for a string"""
+        total_advance = sum(self._glyphs[ch][3] for ch in text
+                            if ch in self._glyphs)
+        heights = [g[0].shape[0] for g in self._glyphs.values()]
+        ascent = max(g[1] for g in self._glyphs.values())
+        margin = max(g[2] for g in self._glyphs.values())
+        # Small width slack: a glyph's padded stamp can outrun its advance
+        canvas = np.zeros((max(heights), total_advance + 2 * margin + 8, 1),
+                          dtype=np.float32)
+        x = margin
+        for ch in text:
+            glyph = self._glyphs.get(ch)
+            if glyph is None:
+                continue
+            g_alpha, g_ascent, g_margin, advance = glyph
+            h, w = g_alpha.shape[:2]
+            y0 = ascent - g_ascent
+            x0 = x - g_margin
+            np.maximum(canvas[y0:y0 + h, x0:x0 + w], g_alpha,
+                       out=canvas[y0:y0 + h, x0:x0 + w])
+            x += advance
+        return canvas, ascent, margin
+
+    def create_frame(
+        self,
+        locations: np.ndarray,
+        has_idea: np.ndarray,
+        time: int,
+        infection_rate: float,
+        texts: tuple = None
+    ) -> np.ndarray:
+        """
+        Create a single frame showing agent positions and idea spread.
+
+        Returns the generator's reused frame buffer: valid until the next
+        create_frame call, so consumers that keep frames around (rather
+        than writing them out immediately) must copy. The buffer is
+        C-contiguous and all drawing here writes in place, so encoders
+        can consume it without an internal relayout copy.
+        """
+        # Hoist config reads to locals once, off the per-agent work below
+        frame = self._frame_buf
+        has_idea = np.ascontiguousarray(has_idea)
+        num_agents = len(locations)
+        cfg = self.config
+        r = cfg.agent_radius
+        width = cfg.width
+        height = cfg.height
+
+        if self._prev_pixels is None or len(self._prev_pixels) != num_agents:
+            # First frame (or population change): full redraw with the
+            # fused njit kernel — coordinate transform and disk writes in
+            # one parallel pass with no intermediate index arrays
+            np.copyto(frame, self.base_frame)
+            new_pixels = np.empty((num_agents, 2), dtype=np.int32)
+            _render_agents(
                 frame,
-                pixel_pos,
-                self.config.agent_radius,
-                color,
-                -1  # Filled circle
+                np.ascontiguousarray(locations, dtype=np.float32),
+                has_idea,
+                self._px_offset, self._py_offset,
+                self._lon_scale, self._lat_scale,
+                self._disk_offsets, self._idea_color, self._no_idea_color,
+                new_pixels
             )
-
-        # Add stats overlay
-        overlay = frame.copy()
-        cv2.rectangle(overlay, (30, 20), (320, 120), (0, 0, 0), -1)
-        cv2.addWeighted(overlay, 0.6, frame, 0.4, 0, frame)
-
-        # Calculate current date and time
-        hour = state['time'] % 24
-        day = state['time'] // 24 + 1  # Add 1 to start from day 1
-
-        # Add text
-        cv2.putText(
-            frame,
-            f"Day {day}, {hour:02d}:00",
-            (50, 50),
-            cv2.FONT_HERSHEY_SIMPLEX,
-            0.8,
-            (255, 255, 255),
-            2
-        )
-
-        cv2.putText(
-            frame,
-            f"Idea Adoption Rate: {state['infection_rate']:.1%}",
-            (50, 100),
-            cv2.FONT_HERSHEY_SIMPLEX,
-            0.8,
-            (255, 255, 255),
-            2
+        else:
+            # Delta frame: most agents stay put between hours, so only
+            # erase (restore base pixels) and repaint where the pixel
+            # position or idea flag changed. Start by restoring the
+            # overlay rect, which last frame's panel darken + text dirtied.
+            oy0, oy1, ox0, ox1 = self._overlay_box
+            frame[oy0:oy1, ox0:ox1] = self.base_frame[oy0:oy1, ox0:ox1]
+
+            new_pixels = self._coords_to_pixels(locations)
+            changed = ((new_pixels != self._prev_pixels).any(axis=1)
+                       | (has_idea != self._prev_ideas))
+            # Static agents shadowed by the overlay restore must repaint too
+            repaint = ((new_pixels[:, 0] >= ox0 - r) & (new_pixels[:, 0] <= ox1 - 1 + r)
+                       & (new_pixels[:, 1] >= oy0 - r) & (new_pixels[:, 1] <= oy1 - 1 + r))
+
+            erase_idx = np.flatnonzero(changed)
+            if len(erase_idx):
+                # Pixel keys in int64: an agent outside TOKYO_BOUNDS maps
+                # to an arbitrary int32 pixel, and key arithmetic must not
+                # wrap on it (the draw kernels themselves clamp per pixel,
+                # so off-map agents are simply not drawn)
+                prev64 = self._prev_pixels.astype(np.int64)
+                new64 = new_pixels.astype(np.int64)
+                # Co-located agents (common at stations) share pixels, so
+                # erase each stale pixel once, not once per agent
+                _, first = np.unique(
+                    prev64[erase_idx, 1] * width + prev64[erase_idx, 0],
+                    return_index=True)
+                deduped = erase_idx[first]
+                _erase_agents(frame, self.base_frame, self._prev_pixels,
+                              deduped, self._disk_offsets)
+                # Erasing a moved agent's disk also clips any static
+                # agent whose disk overlaps the erased region; two
+                # radius-r disks interact out to 2r pixels apart, so
+                # repaint every agent within that Chebyshev band of an
+                # erased pixel, not just exact pixel matches
+                span = np.arange(-2 * r, 2 * r + 1)
+                near_keys = (
+                    (prev64[deduped, 1][:, None, None] + span[None, :, None])
+                    * width
+                    + (prev64[deduped, 0][:, None, None] + span[None, None, :])
+                ).ravel()
+                keys = new64[:, 1] * width + new64[:, 0]
+                repaint |= np.isin(keys, near_keys)
+            repaint |= changed
+
+            paint_idx = np.flatnonzero(repaint)
+            if len(paint_idx):
+                # Likewise draw one disk per unique (pixel, color) pair
+                # instead of one per agent
+                paint64 = new_pixels[paint_idx].astype(np.int64)
+                _, first = np.unique(
+                    (paint64[:, 1] * width + paint64[:, 0]) * 2
+                    + has_idea[paint_idx],
+                    return_index=True)
+                _paint_agents(frame, new_pixels, has_idea, paint_idx[first],
+                              self._disk_offsets, self._idea_color,
+                              self._no_idea_color)
+
+        self._prev_pixels = new_pixels
+        self._prev_ideas = has_idea.copy()
+
+        # Add stats overlay: blending a black rectangle at 0.6 alpha just
+        # scales the panel pixels by 0.4, so darken that ROI in place
+        # instead of copying and addWeighted-ing the whole frame
+        panel = frame[20:121, 30:321]
+        np.multiply(panel, 0.4, out=panel, casting='unsafe')
+
+        # Add text via the glyph cache; callers rendering many frames can
+        # pass precomputed (clock, rate) strings to keep formatting out
+        # of the per-frame loop
+        if texts is None:
+            hour = time % 24
+            day = time // 24 + 1  # Add 1 to start from day 1
+            texts = (f"Day {day}, {hour:02d}:00",
+                     f"Idea Adoption Rate: {infection_rate:.1%}")
+        rect1 = self._draw_text(frame, texts[0], 50, 50, (255, 255, 255))
+        rect2 = self._draw_text(frame, texts[1], 50, 100, (255, 255, 255))
+
+        # Track the full extent the overlay touched — the rate string can
+        # run past the panel's right edge — so the next delta frame
+        # restores all of it, not just the panel rect
+        self._overlay_box = (
+            max(0, min(20, rect1[0], rect2[0])),
+            min(height, max(121, rect1[1], rect2[1])),
+            max(0, min(30, rect1[2], rect2[2])),
+            min(width, max(321, rect1[3], rect2[3])),
         )
 
         return frame
 
+    def _open_ffmpeg(self, output_path: str):
+        """Start an ffmpeg process reading raw BGR frames on stdin, or None"""
+        command = [
+            'ffmpeg', '-y',
+            '-f', 'rawvideo',
+            '-pix_fmt', 'bgr24',
+            '-s', f'{self.config.width}x{self.config.height}',
+            '-r', str(self.config.fps),
+            '-i', '-',
+            '-c:v', 'libx264',
+            # The content is flat dark regions with small colored dots:
+            # spend encoder time on nothing, cap quality at CRF 28
+            # (visually lossless here) and let x264 size its own threads
+            '-preset', 'ultrafast',
+            '-tune', 'zerolatency',
+            '-threads', '0',
+            '-crf', '28',
+            '-pix_fmt', 'yuv420p',
+            output_path
+        ]
+        try:
+            return subprocess.Popen(
+                command,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL
+            )
+        except FileNotFoundError:
+            return None
+
+    def _open_writer(self, output_path: str):
+        """
+        Set up the best available encoder for output_path.
+
+        Returns (write_frame, finish, actual_path) or None when no
+        encoder could be initialized. Prefers piping raw BGR frames to
+        ffmpeg, which encodes in native code with proper buffering and
+        holds steady throughput on long videos; falls back to OpenCV's
+        VideoWriter, trying codec options.
+        """
+        proc = self._open_ffmpeg(output_path)
+        if proc is not None:
+            print("Encoding via piped ffmpeg")
+
+            # Frames are C-contiguous uint8, so hand ffmpeg a memoryview
+            # over the array instead of materializing a multi-MB bytes
+            # object per frame
+            def write_frame(frame):
+                proc.stdin.write(memoryview(frame))
+
+            def finish():
+                proc.stdin.close()
+                proc.wait()
+
+            return write_frame, finish, output_path
+
+        codecs = [
+            ('mp4v', '.mp4'),
+            ('avc1', '.mp4'),
+            ('X264', '.mp4'),
+            ('XVID', '.avi'),
+        ]
+
+        for codec, ext in codecs:
+            try:
+                # Update output path with correct extension
+                current_output = output_path.rsplit('.', 1)[0] + ext
+
+                fourcc = cv2.VideoWriter_fourcc(*codec)
+                out = cv2.VideoWriter(
+                    current_output,
+                    fourcc,
+                    self.config.fps,
+                    (self.config.width, self.config.height)
+                )
+
+                if out.isOpened():
+                    print(f"Successfully initialized VideoWriter with codec: {codec}")
+                    return out.write, out.release, current_output
+            except Exception as e:
+                print(f"Failed to initialize codec {codec}: {e}")
+                continue
+
+        print("Failed to initialize any video codec")
+        return None
+
     def generate_video(
         self,
-        simulation_states: List[Dict],
+        history_locs: np.ndarray,
+        history_idea: np.ndarray,
         output_path: str
     ) -> bool:
-        """Generate video from simulation states"""
+        """
+        Generate video from simulation history arrays.
+
+        history_locs is (T, N, 2) float32 coordinates and history_idea is
+        (T, N) bool idea flags, as returned by TokyoSimulation.run — flat
+        buffers instead of a per-tick list of per-agent tuples.
+        """
         try:
             print(f"Starting video generation to: {output_path}")
 
-            # Try different codec options
-            codecs = [
-                ('mp4v', '.mp4'),
-                ('avc1', '.mp4'),
-                ('X264', '.mp4'),
-                ('XVID', '.avi'),
+            opened = self._open_writer(output_path)
+            if opened is None:
+                return False
+            write_frame, _finish, current_output = opened
+
+            num_frames = len(history_locs)
+            print(f"Processing {num_frames} frames")
+
+            # Precompute every frame's overlay strings and adoption rates
+            # up front, keeping string formatting out of the encode loop
+            rates = history_idea.mean(axis=1)
+            texts = [
+                (f"Day {t // 24 + 1}, {t % 24:02d}:00",
+                 f"Idea Adoption Rate: {rates[i]:.1%}")
+                for i, t in enumerate(range(1, num_frames + 1))
             ]
 
-            for codec, ext in codecs:
-                try:
-                    # Update output path with correct extension
-                    current_output = output_path.rsplit('.', 1)[0] + ext
-
-                    fourcc = cv2.VideoWriter_fourcc(*codec)
-                    out = cv2.VideoWriter(
-                        current_output,
-                        fourcc,
-                        self.config.fps,
-                        (self.config.width, self.config.height)
-                    )
-
-                    if out.isOpened():
-                        print(f"Successfully initialized VideoWriter with codec: {codec}")
+            # Encode on a background thread so frame building and codec
+            # work overlap; the bounded queue keeps at most a few frames
+            # in flight for backpressure
+            frame_queue = queue.Queue(maxsize=4)
+            # If write_frame fails (e.g. the ffmpeg pipe dies), the
+            # thread must keep draining the queue — exiting would leave
+            # the producer blocked forever on the bounded put
+            write_error = []
+
+            def _writer():
+                while True:
+                    frame = frame_queue.get()
+                    if frame is None:
                         break
-                except Exception as e:
-                    print(f"Failed to initialize codec {codec}: {e}")
-                    continue
-            else:
-                print("Failed to initialize any video codec")
+                    if write_error:
+                        continue
+                    try:
+                        write_frame(frame)
+                    except Exception as e:
+                        write_error.append(e)
+
+            writer = threading.Thread(target=_writer)
+            writer.start()
+
+            for i in range(num_frames):
+                frame = self.create_frame(
+                    history_locs[i],
+                    history_idea[i],
+                    i + 1,  # run() records state after each step
+                    float(rates[i]),
+                    texts[i]
+                )
+                # create_frame reuses its buffer, so queue a copy
+                frame_queue.put(frame.copy())
+                if self.config.debug and i % 50 == 0:
+                    print(f"Processed frame {i}/{num_frames}")
+
+            frame_queue.put(None)
+            writer.join()
+            try:
+                _finish()
+            except Exception as e:
+                if not write_error:
+                    write_error.append(e)
+
+            if write_error:
+                print(f"Error writing video frames: {write_error[0]}")
                 return False
 
-            print(f"Processing {len(simulation_states)} frames")
-            for i, state in enumerate(simulation_states):
-                frame = self.create_frame(state)
-                out.write(frame)
-                if i % 50 == 0:
-                    print(f"Processed frame {i}/{len(simulation_states)}")
+            return self._finalize_output(current_output, output_path)
 
-            out.release()
-
-            # Verify file was created
-            if os.path.exists(current_output):
-                file_size = os.path.getsize(current_output)
-                print(f"Video generated successfully. File size: {file_size} bytes")
+        except Exception as e:
+            print(f"Error generating video: {e}")
+            import traceback
+            print(traceback.format_exc())
+            return False
 
-                # If the output path is different from the original, rename it
-                if current_output != output_path:
-                    os.rename(current_output, output_path)
+    def generate_video_parallel(
+        self,
+        history_locs: np.ndarray,
+        history_idea: np.ndarray,
+        output_path: str,
+        max_workers: int = None
+    ) -> bool:
+        """
+        Like generate_video, but renders frames across worker processes.
+
+        Frame construction is independent across frames, so workers each
+        build frames against the immutable base map, which is shared via
+        multiprocessing.shared_memory rather than re-pickled per task.
+        Encoding stays serial in this process, consuming results in
+        order. Worthwhile for long or high-resolution renders; for short
+        ones the serial delta renderer usually wins.
+        """
+        try:
+            print(f"Starting parallel video generation to: {output_path}")
 
-                return True
-            else:
-                print("Video file not found after generation")
+            opened = self._open_writer(output_path)
+            if opened is None:
                 return False
+            write_frame, _finish, current_output = opened
+
+            num_frames = len(history_locs)
+            print(f"Processing {num_frames} frames")
+
+            rates = history_idea.mean(axis=1)
+            texts = [
+                (f"Day {t // 24 + 1}, {t % 24:02d}:00",
+                 f"Idea Adoption Rate: {rates[i]:.1%}")
+                for i, t in enumerate(range(1, num_frames + 1))
+            ]
+
+            # One shared copy of the base map for every worker
+            shm = shared_memory.SharedMemory(
+                create=True, size=self.base_frame.nbytes)
+            shm_frame = np.ndarray(self.base_frame.shape, dtype=np.uint8,
+                                   buffer=shm.buf)
+            np.copyto(shm_frame, self.base_frame)
+
+            try:
+                with ProcessPoolExecutor(
+                    max_workers=max_workers,
+                    initializer=_init_render_worker,
+                    initargs=(shm.name, self.base_frame.shape, self.config)
+                ) as executor:
+                    tasks = (
+                        (history_locs[i], history_idea[i], i + 1,
+                         float(rates[i]), texts[i])
+                        for i in range(num_frames)
+                    )
+                    for i, frame in enumerate(
+                            executor.map(_render_frame_task, tasks,
+                                         chunksize=16)):
+                        write_frame(frame)
+                        if self.config.debug and i % 50 == 0:
+                            print(f"Processed frame {i}/{num_frames}")
+            finally:
+                del shm_frame
+                shm.close()
+                shm.unlink()
+
+            _finish()
+
+            return self._finalize_output(current_output, output_path)
 
         except Exception as e:
             print(f"Error generating video: {e}")
             import traceback
             print(traceback.format_exc())
             return False
+
+    def _finalize_output(self, current_output: str, output_path: str) -> bool:
+        """Verify the encoder produced a file and move it into place"""
+        if os.path.exists(current_output):
+            file_size = os.path.getsize(current_output)
+            print(f"Video generated successfully. File size: {file_size} bytes")
+
+            # If the output path is different from the original, rename it
+            if current_output != output_path:
+                os.rename(current_output, output_path)
+
+            return True
+        else:
+            print("Video file not found after generation")
+            return False
+
+# Per-process state for generate_video_parallel render workers
+_worker_gen = None
+
+def _init_render_worker(shm_name, base_shape, config):
+    """Attach the shared base map and build this worker's generator"""
+    global _worker_gen
+    shm = shared_memory.SharedMemory(name=shm_name)
+    base_frame = np.ndarray(base_shape, dtype=np.uint8, buffer=shm.buf)
+    base_frame.flags.writeable = False
+    _worker_gen = SimulationVideoGenerator(config, base_frame=base_frame)
+    # Keep the segment mapped for this worker's lifetime
+    _worker_gen._shm = shm
+
+def _render_frame_task(args):
+    """Render one frame in a worker; the result is pickled back in order"""
+    locations, has_idea, time, infection_rate, texts = args
+    # create_frame reuses its buffer and executor.map batches chunksize
+    # results before pickling them, so hand back a copy — otherwise every
+    # frame in a chunk aliases the chunk's last render
+    return _worker_gen.create_frame(locations, has_idea, time,
+                                    infection_rate, texts).copy()
@@ -0,0 +1,13 @@
+"""WSGI entry point for production servers.
+
+Run with, for example:
+
+    gunicorn --workers $(nproc) --threads 2 --timeout 300 wsgi:app
+
+The simulation is CPU-bound, so size workers to cores; each worker warms
+the Numba kernels at import, before it accepts requests.
+"""
+from server import app
+
+if __name__ == '__main__':
+    app.run()